@@ -1,13 +1,16 @@
+from functools import lru_cache
 from uuid import UUID
 
 from pydantic import BaseModel
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
 from sqlmodel import SQLModel
 
 from src.crud.crud_layer_project import layer_project as crud_layer_project
 from src.db.models.layer import ToolType
 from src.schemas.toolbox_base import ColumnStatisticsOperation
-from src.utils import search_value
+from src.utils import quote_identifier, search_values
 
 
 async def read_chart_data(
@@ -31,73 +34,135 @@ async def read_chart_data(
 
     # Get chart data
     charts = layer_project.charts
-    operation = charts["operation"]
-    x_label = charts["x_label"]
-    y_label = charts["y_label"]
     group_by = charts.get("group_by")
+    x_column, y_query, data_column = get_chart_columns(
+        attribute_mapping=layer_project.attribute_mapping,
+        charts=charts,
+        cumsum=cumsum,
+    )
+
+    sql_base = build_chart_base_sql(
+        table_name=layer_project.table_name,
+        x_column=x_column,
+        y_query=y_query,
+        data_column=data_column,
+    )
+    sql = _build_chart_sql(sql_base=sql_base, grouped=bool(group_by), cumsum=cumsum)
+    result = await async_session.execute(sql, {"layer_id": layer_project.layer_id})
+    row = result.fetchone()
+    data = {"x": row[0], "y": row[1], "group": row[2] if group_by else None}
+    return data
+
+
+def get_chart_columns(
+    attribute_mapping: dict, charts: dict, cumsum: bool
+) -> tuple[str, str, str | None]:
+    """Get the x column, the statistics expression and the grouped data column of a chart."""
+
+    return _get_chart_columns(
+        attribute_mapping=tuple(attribute_mapping.items()),
+        operation=charts["operation"],
+        x_label=charts["x_label"],
+        y_label=charts["y_label"],
+        grouped=bool(charts.get("group_by")),
+        cumsum=cumsum,
+    )
+
 
+@lru_cache(maxsize=512)
+def _get_chart_columns(
+    attribute_mapping: tuple,
+    operation: str,
+    x_label: str,
+    y_label: str,
+    grouped: bool,
+    cumsum: bool,
+) -> tuple[str, str, str | None]:
+    """Resolve the chart columns. Cached as the attribute mapping of a layer rarely changes between chart requests."""
+
+    attribute_mapping = dict(attribute_mapping)
+    chart_operation = operation
     if cumsum:
         operation = ColumnStatisticsOperation.sum.value
 
-    # Get y_query
-    x_label_mapped = search_value(layer_project.attribute_mapping, x_label)
-    y_label_mapped = search_value(layer_project.attribute_mapping, y_label)
+    # Map the labels to their columns in one pass over the attribute mapping
+    labels = [x_label, y_label]
+    if grouped:
+        # Use the original operation here since operation might have been changed
+        labels.append(chart_operation + "_grouped")
+    x_label_mapped, y_label_mapped, *data_column = search_values(
+        attribute_mapping, labels
+    )
 
-    # Replace count with sum in case operation is count
-    if operation == ColumnStatisticsOperation.count.value:
-        operation = ColumnStatisticsOperation.sum.value
+    if not grouped:
+        # Define statistics query. Count is replaced with sum.
+        y_query = crud_layer_project.get_statistics_sql(
+            quote_identifier(y_label_mapped), operation, count_as_sum=True
+        )
+        data_column = None
+    else:
+        # Define statistics query on the grouped values cast to float
+        y_query = crud_layer_project.get_statistics_sql(
+            "value", operation, cast="float", count_as_sum=True
+        )
+        data_column = data_column[0]
+
+    return x_label_mapped, y_query, data_column
 
-    if not group_by:
-        # Define statistics query
-        y_query = crud_layer_project.get_statistics_sql(y_label_mapped, operation)
-        # Get data from layer
-
-        sql_base = f"""
-            SELECT {x_label_mapped} AS x, {y_query} AS y
-            FROM {layer_project.table_name}
-            WHERE layer_id = '{layer_project.layer_id}'
-            GROUP BY {x_label_mapped}
-            ORDER BY {x_label_mapped}
+
+def build_chart_base_sql(
+    table_name: str,
+    x_column: str,
+    y_query: str,
+    data_column: str | None,
+) -> str:
+    """Build the query computing the chart values per x (and group) of a layer."""
+
+    table_name = quote_identifier(table_name)
+    x_column = quote_identifier(x_column)
+
+    if data_column is None:
+        return f"""
+            SELECT {x_column} AS x, {y_query} AS y
+            FROM {table_name}
+            WHERE layer_id = :layer_id
+            GROUP BY {x_column}
         """
+
+    data_column = quote_identifier(data_column)
+    return f"""
+        SELECT {x_column} x, key AS group, {y_query} AS y
+        FROM {table_name}, LATERAL JSONB_EACH({data_column})
+        WHERE layer_id = :layer_id
+        GROUP BY {x_column}, key
+        ORDER BY {x_column}, key
+    """
+
+
+@lru_cache(maxsize=256)
+def _build_chart_sql(sql_base: str, grouped: bool, cumsum: bool) -> TextClause:
+    """Wrap the chart base query. The layer ID is passed as bind parameter so the statement is identical across calls and can be reused as prepared statement."""
+
+    if not grouped:
+        # Use subqueries and order inside the aggregation so the values are aggregated in a single pass
         if cumsum is False:
             sql = f"""
-                WITH data AS (
+                SELECT jsonb_agg(x ORDER BY x), jsonb_agg(y ORDER BY x)
+                FROM (
                     {sql_base}
-                )
-                SELECT jsonb_agg(x), jsonb_agg(y)
-                FROM data
+                ) data
             """
         else:
             sql = f"""
-                WITH data AS (
-                    {sql_base}
-                ),
-                cumsum AS (
+                SELECT jsonb_agg(x ORDER BY x), jsonb_agg(y ORDER BY x)
+                FROM (
                     SELECT x, SUM(y) OVER (ORDER BY x) AS y
-                    FROM data
-                )
-                SELECT jsonb_agg(x), jsonb_agg(y)
-                FROM cumsum
+                    FROM (
+                        {sql_base}
+                    ) data
+                ) cumsum
             """
     else:
-        # Define statistics query
-        y_query = crud_layer_project.get_statistics_sql("value", operation)
-
-        # Cast value inside query to float
-        y_query = y_query.replace("value", "value::float")
-        # Use the original operation here since operation might have been changed
-        data_column = search_value(
-            layer_project.attribute_mapping, charts["operation"] + "_grouped"
-        )
-
-        # Build query
-        sql_base = f"""
-            SELECT {x_label_mapped} x, key AS group, {y_query} AS y
-            FROM {layer_project.table_name}, LATERAL JSONB_EACH({data_column})
-            WHERE layer_id = '{layer_project.layer_id}'
-            GROUP BY {x_label_mapped}, key
-            ORDER BY {x_label_mapped}, key
-        """
         # Adjust query based on cumsum
         if cumsum is False:
             sql = f"""
@@ -133,10 +198,7 @@ async def read_chart_data(
                 FROM second_grouped
             """
 
-    result = await async_session.execute(sql)
-    data = result.fetchall()
-    data = {"x": data[0][0], "y": data[0][1], "group": data[0][2] if group_by else None}
-    return data
+    return text(sql)
 
 
 class Chart:
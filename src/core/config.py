@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Any, Dict, Optional
 from uuid import UUID
 
@@ -14,6 +15,36 @@ class SyncPostgresDsn(PostgresDsn):
     allowed_schemes = {"postgresql", "postgresql+psycopg2", "postgresql+pg8000"}
 
 
+# The DSNs only depend on the connection parameters, so they are built once even if the settings are validated again
+@lru_cache(maxsize=8)
+def build_postgres_database_uri(
+    user: str | None,
+    password: str | None,
+    host: str | None,
+    port: str | None,
+    db: str | None,
+) -> str:
+    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
+
+
+@lru_cache(maxsize=8)
+def build_async_postgres_dsn(
+    user: str | None,
+    password: str | None,
+    host: str | None,
+    port: str | None,
+    db: str | None,
+) -> str:
+    return AsyncPostgresDsn.build(
+        scheme="postgresql+asyncpg",
+        user=user,
+        password=password,
+        host=host,
+        port=port,
+        path=f"/{db or ''}",
+    )
+
+
 class Settings(BaseSettings):
     AUTH: Optional[bool] = True
     TEST_MODE: Optional[bool] = False
@@ -50,7 +81,13 @@ class Settings(BaseSettings):
 
     @validator("POSTGRES_DATABASE_URI", pre=True)
     def postgres_database_uri_(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
-        return f'postgresql://{values.get("POSTGRES_USER")}:{values.get("POSTGRES_PASSWORD")}@{values.get("POSTGRES_SERVER")}:{values.get("POSTGRES_PORT")}/{values.get("POSTGRES_DB")}'
+        return build_postgres_database_uri(
+            values.get("POSTGRES_USER"),
+            values.get("POSTGRES_PASSWORD"),
+            values.get("POSTGRES_SERVER"),
+            values.get("POSTGRES_PORT"),
+            values.get("POSTGRES_DB"),
+        )
 
     ASYNC_SQLALCHEMY_DATABASE_URI: Optional[AsyncPostgresDsn] = None
 
@@ -60,13 +97,12 @@ class Settings(BaseSettings):
     ) -> Any:
         if isinstance(v, str):
             return v
-        return AsyncPostgresDsn.build(
-            scheme="postgresql+asyncpg",
-            user=values.get("POSTGRES_USER"),
-            password=values.get("POSTGRES_PASSWORD"),
-            host=values.get("POSTGRES_SERVER"),
-            port=values.get("POSTGRES_PORT"),
-            path=f"/{values.get('POSTGRES_DB') or ''}",
+        return build_async_postgres_dsn(
+            values.get("POSTGRES_USER"),
+            values.get("POSTGRES_PASSWORD"),
+            values.get("POSTGRES_SERVER"),
+            values.get("POSTGRES_PORT"),
+            values.get("POSTGRES_DB"),
         )
 
     # R5 config
@@ -123,6 +159,8 @@ class Settings(BaseSettings):
     CELERY_TASK_TIME_LIMIT: Optional[int] = 60  # seconds
     RUN_AS_BACKGROUND_TASK: Optional[bool] = True
     MAX_NUMBER_PARALLEL_JOBS: Optional[int] = 6
+    # Jobs running at once per process, below the database pool size
+    MAX_NUMBER_BACKGROUND_JOBS: Optional[int] = 10
     TESTING: Optional[bool] = False
     MAX_FOLDER_COUNT: Optional[int] = 100
 
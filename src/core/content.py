@@ -1,3 +1,4 @@
+from operator import attrgetter
 from typing import Callable, List, Type
 from fastapi import Depends, HTTPException, status
 from fastapi_pagination import Params as PaginationParams
@@ -7,8 +8,9 @@ from sqlalchemy.sql import Select
 from sqlmodel import SQLModel
 from src.db.session import AsyncSession
 from src.schemas.common import ContentIdList
-from sqlalchemy import select, and_, or_
-from sqlalchemy.orm import contains_eager, selectinload
+from sqlalchemy import select, and_, or_, func, null, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import contains_eager
 from src.db.models import User
 
 
@@ -61,10 +63,9 @@ async def read_contents_by_ids(
 
     # Check if all contents were found
     if len(contents.items) != len(ids.ids):
+        found_ids = {content.id for content in contents.items}
         not_found_contents = [
-            content_id
-            for content_id in ids.ids
-            if content_id not in [content.id for content in contents.items]
+            content_id for content_id in ids.ids if content_id not in found_ids
         ]
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -212,6 +213,43 @@ async def delete_content_by_id(
 #         )
 
 
+def shared_with_subquery(
+    link_model,
+    link_field,
+    content_model,
+    shared_model,
+    shared_column,
+    role_model,
+):
+    """Aggregate the teams or organizations a content is shared with into a JSONB array."""
+
+    return (
+        select(
+            func.coalesce(
+                func.jsonb_agg(
+                    func.jsonb_build_object(
+                        "role",
+                        role_model.name,
+                        "id",
+                        shared_model.id,
+                        "name",
+                        shared_model.name,
+                        "avatar",
+                        shared_model.avatar,
+                    )
+                ),
+                text("'[]'::jsonb"),
+                type_=JSONB,
+            )
+        )
+        .select_from(link_model)
+        .join(shared_model, shared_column == shared_model.id)
+        .join(role_model, link_model.role_id == role_model.id)
+        .where(getattr(link_model, link_field) == content_model.id)
+        .scalar_subquery()
+    )
+
+
 def create_query_shared_content(
     model,
     team_link_model,
@@ -260,7 +298,9 @@ def create_query_shared_content(
     # Basic query to join the User who owns the Layer or Project
     base_query = select(
         model,
-        role_model.id.label("valid_role_id"),
+        (role_model.id if team_id or organization_id else null()).label(
+            "valid_role_id"
+        ),
         User.id.label("valid_user_id"),
         User.firstname.label("user_firstname"),
         User.lastname.label("user_lastname"),
@@ -309,37 +349,45 @@ def create_query_shared_content(
             )  # Adjust field as needed for relationships
         )
     else:
-        # Query for the case with no team_id or organization_id
-        query = (
-            base_query.outerjoin(
-                team_link_model, getattr(team_link_model, link_field) == model.id
-            )  # Outer join for team_link_model
-            .outerjoin(
-                team_model, team_link_model.team_id == team_model.id
-            )  # Outer join for team_model
-            .outerjoin(
-                role_model, team_link_model.role_id == role_model.id
-            )  # Outer join for role_model
-            .outerjoin(
-                organization_link_model,
-                getattr(organization_link_model, link_field) == model.id,
-            )  # Outer join for organization_link_model
-            .outerjoin(
-                organization_model,
-                organization_link_model.organization_id == organization_model.id,
-            )  # Outer join for organization_model
-            .where(and_(*filters))
-            .options(
-                selectinload(getattr(model, "team_links")).selectinload(
-                    team_link_model.team
-                ),  # Preload team links and corresponding teams
-                selectinload(getattr(model, "organization_links")).selectinload(
-                    organization_link_model.organization
-                ),  # Preload organization links and corresponding organizations
-            )
-        )
+        # Query for the case with no team_id or organization_id. The teams and organizations the content is shared with are aggregated in the same query.
+        query = base_query.add_columns(
+            shared_with_subquery(
+                link_model=team_link_model,
+                link_field=link_field,
+                content_model=model,
+                shared_model=team_model,
+                shared_column=team_link_model.team_id,
+                role_model=role_model,
+            ).label("shared_teams"),
+            shared_with_subquery(
+                link_model=organization_link_model,
+                link_field=link_field,
+                content_model=model,
+                shared_model=organization_model,
+                shared_column=organization_link_model.organization_id,
+                role_model=role_model,
+            ).label("shared_organizations"),
+        ).where(and_(*filters))
     return query
 
+
+# Field names and getters per content model, so rows can be converted without walking the model on every .dict() call
+_content_fields: dict = {}
+
+
+def content_to_dict(content: SQLModel) -> dict:
+    """Convert a content row to a dict of its model fields."""
+    model = type(content)
+    if model not in _content_fields:
+        fields = tuple(model.__fields__)
+        _content_fields[model] = (fields, attrgetter(*fields))
+    fields, getter = _content_fields[model]
+    values = getter(content)
+    if len(fields) == 1:
+        values = (values,)
+    return dict(zip(fields, values, strict=True))
+
+
 #TODO: Make a pydantic schema for shared_with and owned_by
 def build_shared_with_object(
     items,
@@ -372,23 +420,6 @@ def build_shared_with_object(
             "avatar": item[5],
         }
 
-    def process_links(item, link_key, link_type):
-        """Helper function to process either team or organization links."""
-        shared_with = []
-        links = getattr(item, link_key, None)
-        if not links:
-            return shared_with
-        for link in links:
-            shared_with.append(
-                {
-                    "role": role_mapping[link.role_id],  # Role based on role_mapping
-                    "id": getattr(link, link_type).id,
-                    "name": getattr(link, link_type).name,
-                    "avatar": getattr(link, link_type).avatar,
-                }
-            )
-        return shared_with
-
     result_arr = []
 
     # Determine shared_with key
@@ -410,16 +441,20 @@ def build_shared_with_object(
                 ]
             }
         else:
-            # Case where shared_with includes both teams and organizations
+            # Case where shared_with includes both teams and organizations. These are already aggregated by the query.
             shared_with = {
-                "teams": process_links(item[0], team_key, "team"),
-                "organizations": process_links(item[0], org_key, "organization"),
+                "teams": item.shared_teams,
+                "organizations": item.shared_organizations,
             }
 
         # Add owned_by information
         owned_by = get_owned_by(item)
         result_arr.append(
-            {**item[0].dict(), "shared_with": shared_with, "owned_by": owned_by}
+            {
+                **content_to_dict(item[0]),
+                "shared_with": shared_with,
+                "owned_by": owned_by,
+            }
         )
 
     return result_arr
@@ -1,9 +1,10 @@
 import asyncio
+import contextlib
 import datetime
 import inspect
 import logging
-import uuid
-from functools import wraps
+import time
+from functools import lru_cache, wraps
 from uuid import UUID
 
 from sqlalchemy import text
@@ -11,10 +12,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import settings
 from src.crud.crud_job import job as crud_job
+from src.db.session import session_manager
 from src.schemas.error import ERROR_MAPPING, JobKilledError, TimeoutError, UnknownError
 from src.schemas.job import JobStatusType
 from src.schemas.layer import LayerType, UserDataTable
-from src.utils import table_exists
 
 # Create a logger object for background tasks
 background_logger = logging.getLogger("Background task")
@@ -32,95 +33,151 @@ async def delete_orphan_data(
 ):
     """Delete orphan data from user tables"""
 
-    for table in (
-        UserDataTable.polygon,
-        UserDataTable.line,
-        UserDataTable.point,
-        UserDataTable.no_geometry,
-    ):
-        table_name = f"{table.value}_{str(user_id).replace('-', '')}"
-
-        # Check if table exists
-        if not await table_exists(async_session, settings.USER_DATA_SCHEMA, table_name):
-            print(f"Table {table_name} for {user_id} does not exist.")
+    table_names = {
+        table: f"{table.value}_{str(user_id).replace('-', '')}"
+        for table in (
+            UserDataTable.polygon,
+            UserDataTable.line,
+            UserDataTable.point,
+            UserDataTable.no_geometry,
+        )
+    }
+
+    # Check which tables exist
+    res = await async_session.execute(
+        text(
+            """
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = :schema_name
+            AND table_name::text = ANY(CAST(:table_names AS text[]))
+            """
+        ),
+        {
+            "schema_name": settings.USER_DATA_SCHEMA,
+            "table_names": list(table_names.values()),
+        },
+    )
+    existing_tables = {row[0] for row in res.fetchall()}
+
+    # Build one delete per table so the orphan data of all tables is deleted in one statement
+    deletes = []
+    selects = []
+    params = {"user_id": user_id, "last_run": last_run}
+    for table, table_name in table_names.items():
+        if table_name not in existing_tables:
+            background_logger.debug(
+                "Table %s for %s does not exist.", table_name, user_id
+            )
             continue
 
         # Build condition for layer filtering
         if table == UserDataTable.no_geometry:
-            condition = f"type = '{LayerType.table.value}'"
+            condition = f"l.type = :layer_type_{table.value}"
+            params[f"layer_type_{table.value}"] = LayerType.table.value
         else:
-            condition = f"feature_layer_geometry_type = '{table.value}'"
-
-        # Create temp table with layers owned by user
-        await async_session.execute(text("DROP TABLE IF EXISTS temp_layer;"))
-        temp_table_name = str(uuid.uuid4()).replace("-", "")
-        sql_temp_layer_table = f"""
-            CREATE TABLE temporal."{temp_table_name}" AS
-            SELECT id
-            FROM customer.layer
-            WHERE {condition}
-            AND user_id = '{str(user_id)}';
-        """
-        await async_session.execute(text(sql_temp_layer_table))
-        await async_session.execute(
-            text(f"""ALTER TABLE temporal."{temp_table_name}" ADD PRIMARY KEY(id);""")
-        )
-        await async_session.commit()
-
-        # Get layer_ids to delete from user data table
-        sql_layer_ids_to_delete = f"""
-            SELECT DISTINCT d.layer_id
-            FROM {settings.USER_DATA_SCHEMA}."{table_name}" d
-            LEFT JOIN temporal."{temp_table_name}" l
-            ON l.id = d.layer_id
-            WHERE l.id IS NULL
-            AND d.updated_at > '{last_run.isoformat()}';
-        """
-        layer_ids_to_delete = await async_session.execute(text(sql_layer_ids_to_delete))
-        layer_ids_to_delete = [row[0] for row in layer_ids_to_delete.fetchall()]
+            condition = f"l.feature_layer_geometry_type = :layer_type_{table.value}"
+            params[f"layer_type_{table.value}"] = table.value
 
-        # Drop temp table
-        await async_session.execute(
-            text(f"""DROP TABLE IF EXISTS temporal."{temp_table_name}";""")
+        # Delete the data of layers that are not owned by the user anymore
+        deletes.append(
+            f"""
+            "{table.value}" AS (
+                DELETE FROM {settings.USER_DATA_SCHEMA}."{table_name}"
+                WHERE layer_id IN (
+                    SELECT d.layer_id
+                    FROM {settings.USER_DATA_SCHEMA}."{table_name}" d
+                    WHERE d.updated_at > :last_run
+                    AND NOT EXISTS (
+                        SELECT 1
+                        FROM customer.layer l
+                        WHERE l.id = d.layer_id
+                        AND l.user_id = :user_id
+                        AND {condition}
+                    )
+                )
+                RETURNING '{table_name}' AS table_name, layer_id
+            )
+            """
         )
-        await async_session.commit()
+        selects.append(f'SELECT * FROM "{table.value}"')
+
+    if deletes:
+        sql_delete_orphan_data = f"""
+            WITH {", ".join(deletes)}
+            SELECT DISTINCT table_name, layer_id
+            FROM (
+                {" UNION ALL ".join(selects)}
+            ) deleted
+        """
+        res = await async_session.execute(text(sql_delete_orphan_data), params)
+        deleted_layer_ids = {}
+        for table_name, layer_id in res.fetchall():
+            deleted_layer_ids.setdefault(table_name, []).append(layer_id)
+
+        for table_name in table_names.values():
+            if table_name not in existing_tables:
+                continue
+            if deleted_layer_ids.get(table_name):
+                background_logger.debug(
+                    "Orphan data for %s with the following layer-ids: %s",
+                    table_name,
+                    deleted_layer_ids[table_name],
+                )
+            else:
+                background_logger.debug("No orphan data for %s.", table_name)
 
-        # Delete orphan data
-        if len(layer_ids_to_delete) > 0:
-            print(
-                f"Orphan data for {table_name} with the following layer-ids: {layer_ids_to_delete}"
-            )
-            for layer_id in layer_ids_to_delete:
-                # Delete orphan data
-                sql_delete_orphan_data = f"""
-                DELETE FROM {settings.USER_DATA_SCHEMA}."{table_name}"
-                WHERE layer_id = '{str(layer_id)}';
-                """
-                await async_session.execute(text(sql_delete_orphan_data))
-                await async_session.commit()
-        else:
-            print(f"No orphan data for {table_name}.")
+    await async_session.commit()
     return
 
 
+@lru_cache(maxsize=None)
+def _parameter_names(func, bound: bool) -> frozenset[str]:
+    parameters = list(inspect.signature(func).parameters)
+    # Skip the instance parameter of bound methods
+    return frozenset(parameters[1:] if bound else parameters)
+
+
+def get_parameter_names(func) -> frozenset[str]:
+    """Get the parameter names of a function. Cached per function as signature inspection is slow, bound methods are looked up by their function so no instance is kept alive."""
+    if inspect.ismethod(func):
+        return _parameter_names(func.__func__, True)
+    return _parameter_names(func, False)
+
+
+@lru_cache(maxsize=1024)
+def get_failure_func(cls: type, func):
+    """Get the failure function of a job function, which is named after the function with the suffix _fail."""
+    return getattr(cls, f"{func.__name__}_fail", None)
+
+
+async def run_with_new_session(func, **kwargs):
+    """Run a cleanup function with its own session, so it can run concurrently to others."""
+    async with session_manager.session() as async_session:
+        await func(async_session=async_session, **kwargs)
+
+
 async def run_failure_func(instance, func, *args, **kwargs):
     # Get failure function
-    failure_func_name = f"{func.__name__}_fail"  # Construct the failure function name
-    failure_func = getattr(
-        instance, failure_func_name, None
-    )  # Get the failure function
+    failure_func = get_failure_func(type(instance), func)
     # Run failure function if exists
     if failure_func:
-        # Merge args and kwargs
+        failure_func_name = failure_func.__name__
+        failure_func = failure_func.__get__(instance)
+        # Pick the valid args from the kwargs and else from the attributes of the first arg
+        valid_args = get_parameter_names(failure_func)
         args_dict = vars(args[0]) if args else {}
-        args_check = {**args_dict, **kwargs}
-        # Check for valid args
-        valid_args = inspect.signature(failure_func).parameters.keys()
-        func_args = {k: v for k, v in args_check.items() if k in valid_args}
+        func_args = {
+            k: kwargs[k] if k in kwargs else args_dict[k]
+            for k in valid_args
+            if k in kwargs or k in args_dict
+        }
         try:
             await failure_func(**func_args)
         except Exception as e:
-            print(f"Failure function {failure_func_name} failed with error: {e}")
+            background_logger.exception(
+                "Failure function %s failed with error: %s", failure_func_name, e
+            )
     else:
         # Get the delete orphan, delete temp tables function from class
         delete_temp_tables_func = getattr(instance, "delete_temp_tables", None)
@@ -129,15 +186,71 @@ async def run_failure_func(instance, func, *args, **kwargs):
         min_time = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
             minutes=20
         )
-        await delete_orphan_data(
-            async_session=instance.async_session,
-            user_id=instance.user_id,
-            last_run=min_time,
+
+        async def delete_layer_data():
+            # The orphan cleanup checks the user data against the layer table, which delete_created_layers deletes from. They run one after the other in the original order, so the result doesn't depend on timing.
+            try:
+                await run_with_new_session(
+                    delete_orphan_data, user_id=instance.user_id, last_run=min_time
+                )
+            finally:
+                await run_with_new_session(delete_created_layers)
+
+        # Drop the temp tables concurrently with a session each. Exceptions are collected so a failing cleanup doesn't cancel the others.
+        results = await asyncio.gather(
+            delete_layer_data(),
+            run_with_new_session(delete_temp_tables_func),
+            return_exceptions=True,
         )
-        # Run delete temp tables function
-        await delete_temp_tables_func()
-        # Delete all layers created by the job
-        await delete_created_layers()
+        for result in results:
+            if isinstance(result, Exception):
+                background_logger.error("Job cleanup failed with error: %s", result)
+
+
+# Status values that end a job without success
+UNSUCCESSFUL_JOB_STATUS = frozenset(
+    (
+        JobStatusType.killed.value,
+        JobStatusType.timeout.value,
+        JobStatusType.failed.value,
+    )
+)
+ABORTED_JOB_STATUS = frozenset((JobStatusType.killed.value, JobStatusType.failed.value))
+
+# Last seen simple status per job, so consecutive steps of a killed job don't query it again
+JOB_STATUS_CACHE_TTL = 2  # seconds
+_job_status_cache: dict[UUID, tuple[float, str]] = {}
+
+
+def get_cached_job_status(job_id: UUID) -> str | None:
+    """Get the simple status of a job if it was seen within the cache TTL."""
+    entry = _job_status_cache.get(job_id)
+    if entry is None or time.monotonic() - entry[0] > JOB_STATUS_CACHE_TTL:
+        return None
+    return entry[1]
+
+
+def cache_job_status(job_id: UUID, status_simple: str):
+    """Remember the simple status of a job and drop expired entries."""
+    now = time.monotonic()
+    for key, (timestamp, _) in list(_job_status_cache.items()):
+        if now - timestamp > JOB_STATUS_CACHE_TTL:
+            del _job_status_cache[key]
+    _job_status_cache[job_id] = (now, status_simple)
+
+
+async def cancel_and_wait(task: asyncio.Task):
+    """Cancel a task and wait until it finished its cleanup."""
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError, Exception):
+        await task
+
+
+def get_job_context(instance, kwargs: dict) -> tuple[AsyncSession, UUID]:
+    """Get the async_session and job_id from the kwargs or else from the class instance."""
+    async_session = kwargs.get("async_session") or instance.async_session
+    job_id = kwargs.get("job_id") or instance.job_id
+    return async_session, job_id
 
 
 def job_init():
@@ -145,23 +258,13 @@ def job_init():
         @wraps(func)
         async def wrapper(*args, **kwargs):
             self = args[0]
-            # Check if job_id and async_session are provided in kwards else search them in the class
-            if kwargs.get("async_session"):
-                async_session = kwargs["async_session"]
-            else:
-                async_session = self.async_session
-
-            if kwargs.get("job_id"):
-                job_id = kwargs["job_id"]
-            else:
-                job_id = self.job_id
+            async_session, job_id = get_job_context(self, kwargs)
             background_logger.info(f"Job {str(job_id)} started.")
-            # Get job id
-            job = await crud_job.get(db=async_session, id=job_id)
-            job = await crud_job.update(
-                db=async_session,
-                db_obj=job,
-                obj_in={"status_simple": JobStatusType.running.value},
+            # Set job to running
+            await crud_job.update_status_simple(
+                async_session=async_session,
+                job_id=job_id,
+                status_simple=JobStatusType.running.value,
             )
 
             # Execute function
@@ -179,34 +282,26 @@ def job_init():
                     error = str(UnknownError("Unknown error occurred."))
                 msg_simple = f"{error.__class__.__name__}: {str(error)}"
                 # Update job status simple to failed
-                job = await crud_job.update(
-                    db=async_session,
-                    db_obj=job,
-                    obj_in={
-                        "status_simple": JobStatusType.failed.value,
-                        "msg_simple": msg_simple,
-                    },
+                await crud_job.update_status_simple(
+                    async_session=async_session,
+                    job_id=job_id,
+                    status_simple=JobStatusType.failed.value,
+                    msg_simple=msg_simple,
                 )
                 return
 
             # Update job status to finished in case it is not killed, timeout or failed
-            if result["status"] not in [
-                JobStatusType.killed.value,
-                JobStatusType.timeout.value,
-                JobStatusType.failed.value,
-            ]:
+            if result["status"] not in UNSUCCESSFUL_JOB_STATUS:
                 if kwargs.get("params"):
-                    payload = {
-                        "status_simple": JobStatusType.finished.value,
-                        "payload": kwargs["params"].json(exclude_none=True),
-                    }
+                    payload = {"payload": kwargs["params"].json(exclude_none=True)}
                 else:
-                    payload = {"status_simple": JobStatusType.finished.value}
+                    payload = {}
 
-                job = await crud_job.update(
-                    db=async_session,
-                    db_obj=job,
-                    obj_in=payload,
+                await crud_job.update_status_simple(
+                    async_session=async_session,
+                    job_id=job_id,
+                    status_simple=JobStatusType.finished.value,
+                    **payload,
                 )
                 try:
                     # Get the delete temp tables function from class
@@ -232,45 +327,43 @@ def job_log(job_step_name: str, timeout: int = settings.JOB_TIMEOUT_DEFAULT):
         @wraps(func)
         async def wrapper(*args, **kwargs):
 
-            # Get async_session
             self = args[0] if args else None
-            # Check if job_id and async_session are provided in kwards else search them in the class
-            if kwargs.get("job_id"):
-                job_id = kwargs["job_id"]
-            else:
-                job_id = self.job_id
-
-            # Get async_session
-            if kwargs.get("async_session"):
-                async_session = kwargs["async_session"]
-            else:
-                async_session = self.async_session
+            async_session, job_id = get_job_context(self, kwargs)
 
-            # Update job status to indicate running
-            job = await crud_job.update_status(
-                async_session=async_session,
-                job_id=job_id,
-                status=JobStatusType.running.value,
-                msg_text="Job is running.",
-                job_step_name=job_step_name,
-            )
+            # Update job status to indicate running unless the job was just seen killed. There is no pending work to commit at this point.
+            status_simple = get_cached_job_status(job_id)
+            if status_simple != JobStatusType.killed.value:
+                job = await crud_job.update_status(
+                    async_session=async_session,
+                    job_id=job_id,
+                    status=JobStatusType.running.value,
+                    msg_text="Job is running.",
+                    job_step_name=job_step_name,
+                    commit=False,
+                )
+                status_simple = job.status_simple
+                cache_job_status(job_id, status_simple)
 
             # Exit if job is killed before starting
-            if job.status_simple == JobStatusType.killed.value:
+            if status_simple == JobStatusType.killed.value:
                 await run_failure_func(self, func, **kwargs)
                 msg_text = "Job was killed."
                 background_logger.error(msg_text)
                 return {"status": JobStatusType.killed.value, "msg": msg_text}
 
-            # Execute function
+            # Execute function. The function runs in its own task so it can be cancelled and awaited before the session is used again.
+            task = asyncio.ensure_future(func(*args, **kwargs))
             try:
-                result = await asyncio.wait_for(func(*args, **kwargs), timeout)
+                result = await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.CancelledError:
+                await cancel_and_wait(task)
+                raise
             except asyncio.TimeoutError:
+                # Make sure the function stopped using the session
+                await cancel_and_wait(task)
                 # Roll back the transaction
                 await async_session.rollback()
-                # Handle the timeout here. For example, you can raise a custom exception or log it.
-                await run_failure_func(self, func, *args, **kwargs)
-                # Update job status to indicate timeout
+                # Update job status to indicate timeout. This is done before the cleanup so the status is visible right away.
                 msg_text = f"Job timed out after {timeout} seconds."
                 job = await crud_job.update_status(
                     async_session=async_session,
@@ -279,14 +372,14 @@ def job_log(job_step_name: str, timeout: int = settings.JOB_TIMEOUT_DEFAULT):
                     msg_text=msg_text,
                     job_step_name=job_step_name,
                 )
+                # Handle the timeout here. For example, you can raise a custom exception or log it.
+                await run_failure_func(self, func, *args, **kwargs)
                 background_logger.error(msg_text)
                 raise TimeoutError(msg_text)
             except Exception as e:
                 # Roll back the transaction
                 await async_session.rollback()
-                # Run failure function if exists
-                await run_failure_func(self, func, *args, **kwargs)
-                # Update job status simple to failed
+                # Update job status simple to failed before the cleanup
                 job = await crud_job.update_status(
                     async_session=async_session,
                     job_id=job_id,
@@ -295,28 +388,22 @@ def job_log(job_step_name: str, timeout: int = settings.JOB_TIMEOUT_DEFAULT):
                     error=e,
                     job_step_name=job_step_name,
                 )
+                # Run failure function if exists
+                await run_failure_func(self, func, *args, **kwargs)
                 background_logger.error(f"Job failed with error: {e}")
                 raise e
 
-            # Check if job was killed. The job needs to be expired as it was fetching old data from cache.
-            async_session.expire(job)
-            job = await crud_job.get(db=async_session, id=job_id)
-
-            if job.status_simple == JobStatusType.killed.value:
-                status = JobStatusType.killed.value
-                msg_text = "Job was killed."
-            # Else use the status provided by the function
+            # Use the status provided by the function. The status update keeps the job killed in case it was killed in the meantime.
+            if result["status"] == JobStatusType.failed.value:
+                status = JobStatusType.failed.value
+                msg_text = result["msg"]
+            elif result["status"] == JobStatusType.finished.value:
+                status = JobStatusType.finished.value
+                msg_text = "Job finished successfully."
             else:
-                if result["status"] == JobStatusType.failed.value:
-                    status = JobStatusType.failed.value
-                    msg_text = result["msg"]
-                elif result["status"] == JobStatusType.finished.value:
-                    status = JobStatusType.finished.value
-                    msg_text = "Job finished successfully."
-                else:
-                    raise ValueError(
-                        f"Invalid status {result['status']} returned by function {func.__name__}."
-                    )
+                raise ValueError(
+                    f"Invalid status {result['status']} returned by function {func.__name__}."
+                )
 
             # Update job status if successful
             job = await crud_job.update_status(
@@ -326,18 +413,14 @@ def job_log(job_step_name: str, timeout: int = settings.JOB_TIMEOUT_DEFAULT):
                 job_step_name=job_step_name,
                 msg_text=msg_text,
             )
+            cache_job_status(job_id, job.status_simple)
             # Check if job is killed and run failure function if exists
-            if job.status_simple in [
-                JobStatusType.killed.value,
-                JobStatusType.failed.value,
-            ]:
+            if job.status_simple in ABORTED_JOB_STATUS:
                 # Roll back the transaction
                 await async_session.rollback()
                 # Run failure function if exists
                 await run_failure_func(self, func, *args, **kwargs)
-                msg_txt = "Job was killed"
-                print(msg_txt)
-                raise JobKilledError(msg_txt)
+                raise JobKilledError("Job was killed")
 
             background_logger.info(f"Job step {job_step_name} finished successfully.")
             return result
@@ -347,21 +430,35 @@ def job_log(job_step_name: str, timeout: int = settings.JOB_TIMEOUT_DEFAULT):
     return decorator
 
 
+# Semaphores limiting the background jobs that run at once, so they don't exhaust the database connection pool
+_background_job_semaphores: dict[int, asyncio.Semaphore] = {}
+
+
+async def run_limited(limit: int, func, *args, **kwargs):
+    """Run a background job once less than limit background jobs are running."""
+    semaphore = _background_job_semaphores.get(limit)
+    if semaphore is None:
+        semaphore = _background_job_semaphores[limit] = asyncio.Semaphore(limit)
+    async with semaphore:
+        return await func(*args, **kwargs)
+
+
 def run_background_or_immediately(settings):
+    # The setting is fixed at process start, so it is resolved once when the decorator is applied
+    if settings.RUN_AS_BACKGROUND_TASK is False:
+        # Immediate mode awaits the function directly, so no wrapper is needed
+        return lambda func: func
+
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
             # Get background tasks either from class or from function kwargs
-
-            if kwargs.get("background_tasks"):
-                background_tasks = kwargs["background_tasks"]
-            else:
-                background_tasks = args[0].background_tasks
-
-            if settings.RUN_AS_BACKGROUND_TASK is False:
-                return await func(*args, **kwargs)
-            else:
-                return background_tasks.add_task(func, *args, **kwargs)
+            background_tasks = (
+                kwargs.get("background_tasks") or args[0].background_tasks
+            )
+            return background_tasks.add_task(
+                run_limited, settings.MAX_NUMBER_BACKGROUND_JOBS, func, *args, **kwargs
+            )
 
         return wrapper
 
@@ -386,28 +483,32 @@ class CRUDFailedJob:
             last_run=datetime.datetime.now(datetime.timezone.utc),
         )
 
-    async def delete_temp_tables(self):
+    async def delete_temp_tables(self, async_session: AsyncSession | None = None):
+        async_session = async_session or self.async_session
         # Get all tables that end with the job id
-        sql = f"""
-            SELECT table_name
+        sql = """
+            SELECT format('%I.%I', table_schema, table_name)
             FROM information_schema.tables
             WHERE table_schema = 'temporal'
-            AND table_name LIKE '%{str(self.job_id).replace('-', '')}'
+            AND table_name LIKE :table_suffix
         """
-        res = await self.async_session.execute(text(sql))
-        tables = res.fetchall()
-        # Delete all tables
-        for table in tables:
-            await self.async_session.execute(
-                f"DROP TABLE IF EXISTS temporal.{table[0]} CASCADE;"
+        res = await async_session.execute(
+            text(sql), {"table_suffix": f"%{str(self.job_id).replace('-', '')}"}
+        )
+        tables = [row[0] for row in res.fetchall()]
+        # Delete all tables in one statement
+        if tables:
+            await async_session.execute(
+                text(f"DROP TABLE IF EXISTS {', '.join(tables)} CASCADE;")
             )
-        await self.async_session.commit()
+        await async_session.commit()
 
-    async def delete_created_layers(self):
+    async def delete_created_layers(self, async_session: AsyncSession | None = None):
+        async_session = async_session or self.async_session
         # Delete all layers with the self.job_id
         sql = f"""
             DELETE FROM {settings.CUSTOMER_SCHEMA}.layer
-            WHERE job_id = '{str(self.job_id)}'
+            WHERE job_id = :job_id
         """
-        await self.async_session.execute(text(sql))
-        await self.async_session.commit()
+        await async_session.execute(text(sql), {"job_id": self.job_id})
+        await async_session.commit()
@@ -1,29 +1,33 @@
 # Standard library imports
 import asyncio
-import csv
 import os
 import re
+import shutil
 import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import lru_cache
 from typing import Union
 from uuid import UUID
+from xml.etree import ElementTree
 
 # Third party imports
-import aiofiles
 import aiofiles.os as aos
-import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from fastapi import HTTPException, status
-from openpyxl import load_workbook
-from osgeo import ogr, osr
+from osgeo import gdal, ogr
 from pydantic import BaseModel, HttpUrl
-from pyproj import CRS
+from pyproj import CRS, Transformer
 from qgis.core import (
     QgsProject,
     QgsVectorFileWriter,
     QgsVectorLayer,
 )
 from shapely import wkb
+from shapely.geometry import MultiPolygon, box
+from sqlalchemy import Numeric, and_, case, cast, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql import select, text
 from sqlmodel import SQLModel
@@ -61,14 +65,104 @@ from src.utils import (
     sanitize_error_message,
 )
 
+# Register the OGR drivers once on import instead of on every upload or export
+ogr.RegisterAll()
+
+# Lookups of the Postgres type and the maximum number of columns per type resolved once from the enums
+OGR_POSTGRES_TYPES = {
+    name: member.value for name, member in OgrPostgresType.__members__.items()
+}
+MAX_COLUMNS_PER_TYPE = {
+    name: member.value for name, member in NumberColumnsPerType.__members__.items()
+}
+
 
 async def delete_old_files(max_time: int):
     """Delete old files from data directory."""
-    # Clean all old folders that are older then two hours
-    async for folder in async_scandir(settings.DATA_DIR):
-        stat_result = await aos.stat(os.path.join(settings.DATA_DIR, folder.name))
-        if stat_result.st_mtime < (time.time() - 2 * 3600):
-            await async_delete_dir(os.path.join(settings.DATA_DIR, folder.name))
+    # Clean all old folders that are older then max_time seconds. The stat of the directory entry avoids a lookup by path in a worker thread.
+    cutoff = time.time() - max_time
+    old_folders = [
+        folder.path
+        async for folder in async_scandir(settings.DATA_DIR)
+        if folder.stat(follow_symlinks=False).st_mtime < cutoff
+    ]
+    await asyncio.gather(*(async_delete_dir(folder) for folder in old_folders))
+
+
+def copy_file_object(source, file_path: str, chunk_size: int = 1024 * 1024):
+    """Copy a file object to disk."""
+    with open(file_path, "wb") as buffer:
+        shutil.copyfileobj(source, buffer, chunk_size)
+
+
+def extract_zip_members(
+    zip_ref: zipfile.ZipFile,
+    members: list[str],
+    target_dir: str,
+    chunk_size: int = 1024 * 1024,
+):
+    """Extract members of a ZIP file in parallel with large copy buffers. Members resolving outside of the target directory are rejected."""
+    target_dir = os.path.realpath(target_dir)
+    target_paths = {}
+    for member in members:
+        target_path = os.path.realpath(os.path.join(target_dir, member))
+        if os.path.commonpath([target_dir, target_path]) != target_dir:
+            raise ValueError(f"Invalid file path in ZIP file: {member}")
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        target_paths[member] = target_path
+
+    def extract_member(member: str):
+        with zip_ref.open(member) as source, open(target_paths[member], "wb") as target:
+            shutil.copyfileobj(source, target, chunk_size)
+
+    # Decompression and writing release the GIL so the members are extracted concurrently
+    with ThreadPoolExecutor(
+        max_workers=min(len(target_paths), os.cpu_count() or 1) or 1
+    ) as executor:
+        list(executor.map(extract_member, target_paths))
+
+
+def xml_local_name(tag: str) -> str:
+    """Get the tag name of a XML element without its namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def xlsx_column_index(cell_reference: str) -> int:
+    """Get the column index of a XLSX cell reference like "AB1". Returns 0 if the reference has no column."""
+    index = 0
+    for char in cell_reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index
+
+
+def xlsx_header_has_empty_values(sheet_xml) -> bool:
+    """Check if the first row of a XLSX worksheet contains empty cells. The sheet XML is parsed until the first row only."""
+    min_column = max_column = None
+    columns = set()
+    for _, element in ElementTree.iterparse(sheet_xml):
+        tag = xml_local_name(element.tag)
+        if tag == "dimension":
+            bounds = element.get("ref", "").split(":")
+            min_column = xlsx_column_index(bounds[0])
+            max_column = xlsx_column_index(bounds[-1])
+        elif tag == "row":
+            if element.get("r", "1") == "1":
+                column = 0
+                for cell in element:
+                    column = xlsx_column_index(cell.get("r", "")) or column + 1
+                    # A cell has a value if it holds a value, an inline string or a formula
+                    if any(
+                        xml_local_name(child.tag) in ("v", "is", "f") for child in cell
+                    ):
+                        columns.add(column)
+            break
+
+    # The header spans all columns of the sheet
+    if not min_column:
+        min_column, max_column = 1, max(columns, default=0)
+    return any(column not in columns for column in range(min_column, max_column + 1))
 
 
 def model_to_dict(model):
@@ -82,29 +176,45 @@ def model_to_dict(model):
         return model  # Return the model as is if it's not an instance of SQLModel or BaseModel
 
 
+@lru_cache(maxsize=64)
+def get_transformer_to_4326(source_crs: str) -> Transformer:
+    """Get the transformer from a CRS to EPSG:4326. Cached as building the PROJ pipeline is expensive."""
+    return Transformer.from_crs(source_crs, "EPSG:4326", always_xy=True)
+
+
+@lru_cache(maxsize=4096)
+def build_user_table_name(schema: str, table_prefix: str, user_id: UUID | str) -> str:
+    """Build the name of the table with the user data of a user."""
+    if not isinstance(user_id, UUID):
+        user_id = UUID(user_id)
+    return f"{schema}.{table_prefix}_{user_id.hex}"
+
+
 def get_user_table(layer: Union[dict, SQLModel, BaseModel]):
     """Get the table with the user data based on the layer metadata."""
 
-    # Check if layer is of type dict or SQLModel/BaseModel
-    if isinstance(layer, (SQLModel, BaseModel)):
-        layer = model_to_dict(layer)
-
-    if isinstance(layer, dict):
-        if layer["type"] == LayerType.feature.value:
-            if layer["feature_layer_type"] in (FeatureType.standard, FeatureType.tool):
-                table_prefix = layer["feature_layer_geometry_type"]
-            elif layer["feature_layer_type"] == FeatureType.street_network:
-                table_prefix = (
-                    FeatureType.street_network.value
-                    + "_"
-                    + layer["feature_layer_geometry_type"]
-                )
-        elif layer["type"] == LayerType.table.value:
-            table_prefix = "no_geometry"
-        else:
-            raise ValueError(f"The passed layer type {layer['type']} is not supported.")
-    user_id = layer["user_id"]
-    return f"{settings.USER_DATA_SCHEMA}.{table_prefix}_{str(user_id).replace('-', '')}"
+    # Read the required fields only instead of converting the whole SQLModel/BaseModel to a dict
+    def get_value(key: str):
+        value = layer[key] if isinstance(layer, dict) else getattr(layer, key)
+        return value.value if isinstance(value, Enum) else value
+
+    layer_type = get_value("type")
+    if layer_type == LayerType.feature.value:
+        feature_layer_type = get_value("feature_layer_type")
+        if feature_layer_type in (FeatureType.standard, FeatureType.tool):
+            table_prefix = get_value("feature_layer_geometry_type")
+        elif feature_layer_type == FeatureType.street_network:
+            table_prefix = (
+                FeatureType.street_network.value
+                + "_"
+                + get_value("feature_layer_geometry_type")
+            )
+    elif layer_type == LayerType.table.value:
+        table_prefix = "no_geometry"
+    else:
+        raise ValueError(f"The passed layer type {layer_type} is not supported.")
+    user_id = get_value("user_id")
+    return build_user_table_name(settings.USER_DATA_SCHEMA, table_prefix, user_id)
 
 
 class CRUDLayerBase(CRUDBase):
@@ -117,42 +227,49 @@ class CRUDLayerBase(CRUDBase):
     ) -> str:
         """Check if layer name already exists in project and alter it like layer (n+1) if necessary"""
 
-        # Regular expression to find layer names with a number
-        pattern = re.compile(rf"^{re.escape(layer_name)} \((\d+)\)$")
-
-        # Get all layer names in project
+        # Get the layer names in project and folder in one statement. Only the base layer name and names like "layer_name (n)" are relevant.
+        prefix = f"{layer_name} ("
+        names = select(Layer.name.label("name")).where(
+            Layer.folder_id == folder_id,
+            or_(
+                Layer.name == layer_name, Layer.name.startswith(prefix, autoescape=True)
+            ),
+        )
         if project_id:
-            names_in_project = await async_session.execute(
+            names = names.union_all(
                 select(LayerProjectLink.name).where(
                     LayerProjectLink.project_id == project_id,
-                    LayerProjectLink.name.like(f"{layer_name}%"),
+                    or_(
+                        LayerProjectLink.name == layer_name,
+                        LayerProjectLink.name.startswith(prefix, autoescape=True),
+                    ),
                 )
             )
-            names_in_project = [row[0] for row in names_in_project.fetchall()]
-            layer_names = names_in_project
-        else:
-            layer_names = []
+        names = names.subquery()
 
-        # Get all layer names in folder
-        names_in_folder = await async_session.execute(
-            select(Layer.name).where(
-                Layer.folder_id == folder_id,
-                Layer.name.like(f"{layer_name}%"),
+        # Find the highest number (n) among the names and check if the base layer name exists. The number is cast to numeric as it has no upper limit.
+        number = func.substr(
+            names.c.name, len(prefix) + 1, func.length(names.c.name) - len(prefix) - 1
+        )
+        result = await async_session.execute(
+            select(
+                func.max(
+                    case(
+                        (
+                            and_(
+                                func.left(names.c.name, len(prefix)) == prefix,
+                                func.right(names.c.name, 1) == ")",
+                                number.op("~")(r"^\d+$"),
+                            ),
+                            cast(number, Numeric),
+                        )
+                    )
+                ),
+                func.bool_or(names.c.name == layer_name),
             )
         )
-        names_in_folder = [row[0] for row in names_in_folder.fetchall()]
-        layer_names = list(set(layer_names + names_in_folder))
-
-        # Find the highest number (n) among the layer names using list comprehension
-        numbers = [
-            int(match.group(1))
-            for name in layer_names
-            if (match := pattern.match(name))
-        ]
-        highest_num = max(numbers, default=0)
-
-        # Check if the base layer name exists
-        base_name_exists = layer_name in layer_names
+        highest_num, base_name_exists = result.fetchone()
+        highest_num = int(highest_num or 0)
 
         # Construct the new layer name
         if base_name_exists or highest_num > 0:
@@ -190,13 +307,10 @@ class FileUpload:
         """Fetch data from external service if required, save file to disk."""
 
         if isinstance(self.source, UploadFile):
-            # An existing file was uploaded, save file in chunks
-            async with aiofiles.open(self.file_path, "wb") as buffer:
-                while True:
-                    chunk = await self.source.read(65536)
-                    if not chunk:
-                        break
-                    await buffer.write(chunk)
+            # An existing file was uploaded, copy it in one worker thread call with large chunks.
+            # Rewind first as the file may have been read already, e.g. by the file size check.
+            await self.source.seek(0)
+            await asyncio.to_thread(copy_file_object, self.source.file, self.file_path)
         else:
             # Ensure a URL is specified
             url = self.source.other_properties.url
@@ -238,7 +352,7 @@ class FileUpload:
         """Save file to disk for later operations."""
 
         # Clean all old folders that are older then two hours
-        await delete_old_files(max_time=3600)
+        await delete_old_files(max_time=7200)
 
         # Create folder if exist delete it
         await async_delete_dir(self.folder_path)
@@ -408,7 +522,7 @@ class OGRFileHandling:
             FileUploadType.kml.value: self.validate_kml,
         }
         if self.file_ending == FileUploadType.csv.value:
-            self.driver_name = OgrDriverType[FileUploadType.xlsx.value].value
+            self.driver_name = OgrDriverType.vrt.value
         else:
             self.driver_name = OgrDriverType[self.file_ending].value
 
@@ -455,39 +569,19 @@ class OGRFileHandling:
         # Close the datasource
         data_source = None
 
-        return {"file_path": file_path, **field_type_res}
+        return {"file_path": file_path, "layer_name": layer.GetName(), **field_type_res}
 
     def get_layer_extent(self, layer) -> str:
         """Get layer extent in EPSG:4326."""
         # Get the original extent
         minX, maxX, minY, maxY = layer.GetExtent()
 
-        # Define the source SRS
-        source_srs = layer.GetSpatialRef()
-
-        # Define the target SRS (EPSG:4326)
-        target_srs = osr.SpatialReference()
-        target_srs.ImportFromEPSG(4326)
-
-        # Create a coordinate transformation
-        transform = osr.CoordinateTransformation(source_srs, target_srs)
-
-        # Transform the coordinates
-        min_point = ogr.Geometry(ogr.wkbPoint)
-        min_point.AddPoint(minX, minY)
-        min_point.Transform(transform)
-
-        max_point = ogr.Geometry(ogr.wkbPoint)
-        max_point.AddPoint(maxX, maxY)
-        max_point.Transform(transform)
-
-        # Get the transformed coordinates
-        minY_transformed, minX_transformed, _ = min_point.GetPoint()
-        maxY_transformed, maxX_transformed, _ = max_point.GetPoint()
+        # Transform both corners to EPSG:4326 in one call. Longitude is returned first.
+        transformer = get_transformer_to_4326(layer.GetSpatialRef().ExportToWkt())
+        (minX, maxX), (minY, maxY) = transformer.transform((minX, maxX), (minY, maxY))
 
         # Create a Multipolygon from the extent
-        multipolygon_wkt = f"MULTIPOLYGON((({minX_transformed} {minY_transformed}, {minX_transformed} {maxY_transformed}, {maxX_transformed} {maxY_transformed}, {maxX_transformed} {minY_transformed}, {minX_transformed} {minY_transformed})))"
-        return multipolygon_wkt
+        return MultiPolygon([box(minX, minY, maxX, maxY)]).wkt
 
     def check_field_types(self, layer):
         """Check if field types are valid and label if too many columns where specified."""
@@ -532,94 +626,113 @@ class OGRFileHandling:
                 "srs"
             ] = "EPSG:" + layer.GetSpatialRef().GetAuthorityCode(None)
 
+        # Field names per type as set for constant time lookups of already specified columns
+        valid_field_names_per_type = {}
+        valid, unvalid, overflow = (
+            field_types["valid"],
+            field_types["unvalid"],
+            field_types["overflow"],
+        )
+        get_field_defn = layer_def.GetFieldDefn
         for i in range(layer_def.GetFieldCount()):
-            field_def = layer_def.GetFieldDefn(i)
+            field_def = get_field_defn(i)
             field_name = field_def.GetName().lower()
-            field_type_code = field_def.GetType()
-            field_type = field_def.GetFieldTypeName(field_type_code)
+            field_type = field_def.GetTypeName()
 
             # Get field type from OgrPostgresType enum if exists
-            field_type_pg = (
-                OgrPostgresType[field_type].value
-                if field_type in OgrPostgresType.__members__
-                else None
-            )
+            field_type_pg = OGR_POSTGRES_TYPES.get(field_type)
 
             # Check if field type is defined
             if field_type_pg is None:
-                field_types["unvalid"][field_name] = field_type
+                unvalid[field_name] = field_type
                 continue
-            # Create array for field names of respective type if not already existing
-            if field_type_pg not in field_types["valid"].keys():
-                field_types["valid"][field_type_pg] = []
+            # Create array and set for field names of respective type if not already existing
+            valid_fields = valid.setdefault(field_type_pg, [])
+            valid_field_names = valid_field_names_per_type.setdefault(
+                field_type_pg, set()
+            )
 
             # Check if number of specified field excesses the maximum specified number
             if (
-                NumberColumnsPerType[field_type_pg].value
-                > len(field_types["valid"][field_type_pg])
-                and field_name not in field_types["valid"][field_type_pg]
+                MAX_COLUMNS_PER_TYPE[field_type_pg] > len(valid_fields)
+                and field_name not in valid_field_names
             ):
-                field_types["valid"][field_type_pg].append(field_name)
+                valid_fields.append(field_name)
+                valid_field_names.add(field_name)
 
             # Place fields that are exceeding the maximum number of columns or if the column name was already specified.
-            elif (
-                NumberColumnsPerType[field_type_pg]
-                <= len(field_types["valid"][field_type_pg])
-                or field_name in field_types["valid"][field_type_pg]
-            ):
-                field_types["overflow"][field_type_pg] = field_name
+            else:
+                overflow[field_type_pg] = field_name
 
         return {"data_types": field_types}
 
     def validate_csv(self):
         """Validate if CSV."""
 
-        # Read file in binary mode to check if header exists
-        with open(self.file_path, "rb") as f:
-            sniffer = csv.Sniffer()
-            sample_bytes = 1024
-            sample = f.read(sample_bytes)
+        # Read the header and infer the schema from the first block only
+        try:
+            header = pa_csv.open_csv(
+                self.file_path,
+                read_options=pa_csv.ReadOptions(block_size=64 * 1024),
+            ).schema.names
+        except pa.ArrowInvalid as e:
+            return {
+                "msg": f"CSV is not well-formed: {e}",
+                "status": JobStatusType.failed.value,
+            }
 
-            if not sniffer.has_header(sample.decode("utf-8")):
-                return {
-                    "msg": "CSV is not well-formed: Missing header.",
-                    "status": JobStatusType.failed.value,
-                }
+        if any(not col for col in header):
+            return {
+                "msg": "CSV is not well-formed: Header contains empty values.",
+                "status": JobStatusType.failed.value,
+            }
 
-        # Read file in text mode
-        with open(self.file_path, "r") as f:
-            # Get header
-            csv_reader = csv.reader(f)
-            header = next(csv_reader)
+        # Read the CSV through a VRT to get data types
+        return self.validate_ogr(self.write_csv_vrt())
 
-            if any(not col for col in header):
-                return {
-                    "msg": "CSV is not well-formed: Header contains empty values.",
-                    "status": JobStatusType.failed.value,
-                }
+    def write_csv_vrt(self) -> str:
+        """Write a VRT next to the CSV so OGR reads it natively and detects the data types."""
+        data_source = ElementTree.Element("OGRVRTDataSource")
+        layer = ElementTree.SubElement(data_source, "OGRVRTLayer", name=self.file_name)
+        ElementTree.SubElement(layer, "SrcDataSource", relativeToVRT="1").text = (
+            os.path.basename(self.file_path)
+        )
+        open_options = ElementTree.SubElement(layer, "OpenOptions")
+        for key, value in (("AUTODETECT_TYPE", "YES"), ("AUTODETECT_SIZE_LIMIT", "0")):
+            ElementTree.SubElement(open_options, "OOI", key=key).text = value
+        ElementTree.SubElement(layer, "GeometryType").text = "wkbNone"
 
-        # Load in df to get data types
-        df = pd.read_csv(self.file_path)
-        # Save in XLSX to keep data types
-        df.to_excel(self.file_path + ".xlsx", index=False)
-        return self.validate_ogr(self.file_path + ".xlsx")
+        vrt_path = self.file_path + ".vrt"
+        ElementTree.ElementTree(data_source).write(vrt_path)
+        return vrt_path
 
     def validate_xlsx(self):
         """Validate if XLSX is well-formed."""
-        # Load workbook
-        wb = load_workbook(filename=self.file_path, read_only=True)
-
-        # Check if only one sheet is present
-        if len(wb.sheetnames) != 1:
-            return {
-                "msg": "XLSX is not well-formed: More than one sheet is present.",
-                "status": JobStatusType.failed.value,
-            }
+        # Only read the sheet list and the first row from the XML parts instead of loading the workbook
+        with zipfile.ZipFile(self.file_path) as zip_ref:
+            with zip_ref.open("xl/workbook.xml") as workbook_xml:
+                sheet_count = sum(
+                    1
+                    for _, element in ElementTree.iterparse(workbook_xml)
+                    if xml_local_name(element.tag) == "sheet"
+                )
+            worksheets = [
+                name
+                for name in zip_ref.namelist()
+                if name.startswith("xl/worksheets/") and name.endswith(".xml")
+            ]
+
+            # Check if only one sheet is present
+            if sheet_count != 1 or len(worksheets) != 1:
+                return {
+                    "msg": "XLSX is not well-formed: More than one sheet is present.",
+                    "status": JobStatusType.failed.value,
+                }
 
-        sheet = wb.active
-        # Check header
-        header = [cell.value for cell in sheet[1]]
-        if any(value is None for value in header):
+            # Check header
+            with zip_ref.open(worksheets[0]) as sheet_xml:
+                header_has_empty_values = xlsx_header_has_empty_values(sheet_xml)
+        if header_has_empty_values:
             return {
                 "msg": "XLSX is not well-formed: Header contains empty values.",
                 "status": JobStatusType.failed.value,
@@ -630,40 +743,48 @@ class OGRFileHandling:
     def validate_shapefile(self):
         """Validate if ZIP contains a valid shapefile."""
         with zipfile.ZipFile(self.file_path) as zip_ref:
-            # List all file names in the zip file
+            # Group the file names in the zip file by extension in one pass, skipping directories
             file_names = zip_ref.namelist()
-            # Remove directories from the list of file names
-            file_names = [f for f in file_names if not f.endswith("/")]
+            file_names_by_ext = {}
+            for file_name in file_names:
+                if not file_name.endswith("/"):
+                    ext = os.path.splitext(file_name)[1]
+                    file_names_by_ext.setdefault(ext, []).append(file_name)
 
             # Check for required shapefile components
             extensions = [".shp", ".shx", ".dbf", ".prj"]
-            valid_files = []
             for ext in extensions:
-                matching_files = [f for f in file_names if f.endswith(ext)]
-                if len(matching_files) != 1:
+                if len(file_names_by_ext.get(ext, [])) != 1:
                     return {
                         "msg": f"ZIP must contain exactly one {ext} file.",
                         "status": JobStatusType.failed.value,
                     }
-                valid_files.append(matching_files[0])
 
             # Check if the main shapefile components share the same base name
-            base_name = os.path.splitext(valid_files[0])[0]
-            if any(f"{base_name}{ext}" not in valid_files for ext in extensions):
+            base_names = {
+                os.path.splitext(file_names_by_ext[ext][0])[0] for ext in extensions
+            }
+            if len(base_names) != 1:
                 return {
                     "msg": "All main shapefile components (.shp, .shx, .dbf, .prj) must share the same base name.",
                     "status": JobStatusType.failed.value,
                 }
+            base_name = base_names.pop()
 
-        # Unzip file in temporary directory
-        zip_dir = os.path.join(
-            os.path.dirname(self.file_path),
-            os.path.basename(self.file_path).split(".")[0],
-        )
-
-        # Extra zip file to zip_dir
-        with zipfile.ZipFile(self.file_path) as zip_ref:
-            zip_ref.extractall(zip_dir)
+            # Unzip the shapefile components in temporary directory. Optional sidecar files like .cpg are kept.
+            zip_dir = os.path.join(
+                os.path.dirname(self.file_path),
+                os.path.basename(self.file_path).split(".")[0],
+            )
+            extract_zip_members(
+                zip_ref,
+                [
+                    file_name
+                    for file_name in file_names
+                    if os.path.splitext(file_name)[0] == base_name
+                ],
+                zip_dir,
+            )
 
         return self.validate_ogr(os.path.join(zip_dir, base_name + ".shp"))
 
@@ -682,8 +803,8 @@ class OGRFileHandling:
     async def validate(self):
         """Validate file before uploading."""
 
-        # Run validation
-        result = self.method_match_validate[self.file_ending]()
+        # Run validation in a worker thread as OGR blocks while reading the file
+        result = await asyncio.to_thread(self.method_match_validate[self.file_ending])
 
         if result.get("status") == JobStatusType.failed.value:
             return result
@@ -713,12 +834,8 @@ class OGRFileHandling:
         """Delete folder if validation fails."""
         await async_delete_dir(folder_path)
 
-    @job_log(job_step_name="upload")
-    async def upload_ogr2ogr(self, temp_table_name: str, job_id: UUID):
-        """Upload file to database."""
-
-        # Initialize OGR
-        ogr.RegisterAll()
+    def get_upload_options(self) -> tuple[str | None, str | None]:
+        """Get the geometry type to force during the upload and the layer name of the file."""
 
         # Setup the input GeoJSON data source
         driver = ogr.GetDriverByName(self.driver_name)
@@ -731,35 +848,78 @@ class OGRFileHandling:
             " ", "_"
         )
         if "polygon" in geometry_type.lower():
-            geometry_type = "-nlt MULTIPOLYGON"
+            geometry_type = "MULTIPOLYGON"
         else:
-            geometry_type = ""
+            geometry_type = None
 
-        # Prepare the ogr2ogr command
+        # Get the layer name to read from geopackages
         if self.file_ending == FileUploadType.gpkg.value:
             layer_name = layer.GetName()
         else:
             layer_name = None
 
-        # Build CMD command
-        cmd = (
-            f'ogr2ogr -f "PostgreSQL" "PG:host={settings.POSTGRES_SERVER} dbname={settings.POSTGRES_DB} '
-            f'user={settings.POSTGRES_USER} password={settings.POSTGRES_PASSWORD} port={settings.POSTGRES_PORT}" '
-            f'"{self.file_path}" '
+        # Close data source
+        data_source = None
+
+        return geometry_type, layer_name
+
+    def translate_to_postgres(
+        self, table_name: str, geometry_type: str | None, layer_name: str | None
+    ):
+        """Translate the file into a table in the database like ogr2ogr."""
+
+        options = gdal.VectorTranslateOptions(
+            options=["-dim", "XY", "-unsetFieldWidth"],
+            format="PostgreSQL",
+            # The table name is passed unquoted like it was passed through the shell to ogr2ogr
+            layerName=table_name.replace('"', ""),
+            dstSRS="EPSG:4326",
+            geometryType=geometry_type,
+            layers=[layer_name] if layer_name else None,
+            # Load the table in a single transaction and without spatial index as it is only read once
+            transactionSize="unlimited",
+            layerCreationOptions=["SPATIAL_INDEX=NONE"],
+        )
+        data_source = gdal.VectorTranslate(
+            f"PG:host={settings.POSTGRES_SERVER} dbname={settings.POSTGRES_DB} user={settings.POSTGRES_USER} password={settings.POSTGRES_PASSWORD} port={settings.POSTGRES_PORT}",
+            self.file_path,
+            options=options,
         )
-        if layer_name:
-            cmd += f"{layer_name} "
-        cmd += f'-nln {temp_table_name} -t_srs "EPSG:4326" -progress -dim XY {geometry_type} -unsetFieldWidth'
+        if data_source is None:
+            raise RuntimeError(gdal.GetLastErrorMsg())
+
+        # Close data source to flush the data
+        data_source = None
+
+    @job_log(job_step_name="upload")
+    async def upload_ogr2ogr(
+        self, temp_table_name: str, job_id: UUID, validation_result: dict = None
+    ):
+        """Upload file to database."""
+
+        if validation_result and validation_result.get("layer_name") is not None:
+            # Reuse the layer options of the validation to avoid opening the file with OGR again
+            geometry_type = validation_result["data_types"]["geometry"].get("type", "")
+            if "polygon" in geometry_type.lower():
+                geometry_type = "MULTIPOLYGON"
+            else:
+                geometry_type = None
+            if self.file_ending == FileUploadType.gpkg.value:
+                layer_name = validation_result["layer_name"]
+            else:
+                layer_name = None
+        else:
+            # Read the layer options in a worker thread as OGR blocks while opening the file
+            geometry_type, layer_name = await asyncio.to_thread(self.get_upload_options)
+
         try:
-            # Run as async task
-            task = asyncio.create_task(async_run_command(cmd))
-            await task
+            # Translate in a worker thread with the GDAL bindings instead of spawning ogr2ogr
+            await asyncio.to_thread(
+                self.translate_to_postgres, temp_table_name, geometry_type, layer_name
+            )
         except Exception as e:
             raise Ogr2OgrError(sanitize_error_message(str(e)))
 
-        # Close data source
-        data_source = None
-
         # Build object for job step status
         msg = Msg(type=MsgType.info, text="File uploaded.")
 
@@ -788,9 +948,6 @@ class OGRFileHandling:
     ):
         """Export file from database."""
 
-        # Initialize OGR
-        ogr.RegisterAll()
-
         # Prepare the ogr2ogr command
         if self.file_ending == FileUploadType.gpkg.value:
             pass
@@ -829,13 +986,24 @@ class OGRFileHandling:
                 raise DataOutCRSBoundsError(
                     "The data is outside the bounds of the provided CRS."
                 )
-            to_crs_flag = f"""-t_srs "{crs}" """
+            to_crs_flag = ["-t_srs", crs]
         else:
-            to_crs_flag = ""
-
-        # Build CMD command
-        sql_query = sql_query.replace('"', '\\"')
-        cmd = f"""ogr2ogr -f "{OgrDriverType[file_type.value].value}" "{self.file_path}" PG:"host={settings.POSTGRES_SERVER} dbname={settings.POSTGRES_DB} user={settings.POSTGRES_USER} password={settings.POSTGRES_PASSWORD} port={settings.POSTGRES_PORT}" -sql "{sql_query}" -nln "{layer.name}" {to_crs_flag} -progress"""
+            to_crs_flag = []
+
+        # Build CMD command as argument list so it is run without a shell
+        cmd = [
+            "ogr2ogr",
+            "-f",
+            OgrDriverType[file_type.value].value,
+            self.file_path,
+            f"PG:host={settings.POSTGRES_SERVER} dbname={settings.POSTGRES_DB} user={settings.POSTGRES_USER} password={settings.POSTGRES_PASSWORD} port={settings.POSTGRES_PORT}",
+            "-sql",
+            sql_query,
+            "-nln",
+            layer.name,
+            *to_crs_flag,
+            "-progress",
+        ]
         try:
             # Run as async task
             task = asyncio.create_task(async_run_command(cmd))
@@ -862,31 +1030,38 @@ class OGRFileHandling:
 
         # Check if table has a geometry if not it is just a normal table
         if geom_column is None:
-            target_table = f"{settings.USER_DATA_SCHEMA}.no_geometry_{str(self.user_id).replace('-', '')}"
-            select_geom = ""
-            insert_geom = ""
+            target_table = build_user_table_name(
+                settings.USER_DATA_SCHEMA, "no_geometry", self.user_id
+            )
+            select_geom = []
+            insert_geom = []
             filter_null_geom = ""
         else:
             geometry_type = data_types["geometry"]["type"]
-            target_table = f"{settings.USER_DATA_SCHEMA}.{SupportedOgrGeomType[geometry_type].value}_{str(self.user_id).replace('-', '')}"
-            select_geom = f"{geom_column} as geom, "
-            insert_geom = "geom, "
+            target_table = build_user_table_name(
+                settings.USER_DATA_SCHEMA,
+                SupportedOgrGeomType[geometry_type].value,
+                self.user_id,
+            )
+            select_geom = [f"{geom_column} as geom"]
+            insert_geom = ["geom"]
             filter_null_geom = f"WHERE ST_IsEmpty({geom_column}) IS FALSE"
-        select_statement = ""
-        insert_statement = ""
 
-        # Build select and insert statement
-        for i in attribute_mapping:
-            data_type = i.split("_")[0]
-            select_statement += f""""{attribute_mapping[i]}"::{data_type} as {i}, """
-            insert_statement += f"{i}, "
-        select_statement = f"""SELECT {select_statement} {select_geom} '{str(layer_id)}' FROM {temp_table_name} {filter_null_geom}"""
+        # Build select and insert columns. Source column names come from the uploaded file, so embedded quotes are escaped.
+        select_columns = [
+            f""""{source.replace('"', '""')}"::{target.split("_")[0]} as {target}"""
+            for target, source in attribute_mapping.items()
+        ]
+        select_columns += select_geom + ["CAST(:layer_id AS uuid)"]
+        insert_columns = list(attribute_mapping) + insert_geom + ["layer_id"]
+        select_statement = f"""SELECT {", ".join(select_columns)} FROM {temp_table_name} {filter_null_geom}"""
 
         # Insert data in target table
         await self.async_session.execute(
             text(
-                f"INSERT INTO {target_table}({insert_statement} {insert_geom} layer_id) {select_statement}"
-            )
+                f"INSERT INTO {target_table}({', '.join(insert_columns)}) {select_statement}"
+            ),
+            {"layer_id": str(layer_id)},
         )
         await self.async_session.commit()
 
@@ -916,14 +1091,29 @@ class OGRFileHandling:
 
         # Check if table has a geometry if not it is just a normal table
         if geom_column is None:
-            target_table = f"{settings.USER_DATA_SCHEMA}.no_geometry_{str(self.user_id).replace('-', '')}"
+            target_table = build_user_table_name(
+                settings.USER_DATA_SCHEMA, "no_geometry", self.user_id
+            )
         else:
             geometry_type = data_types["geometry"]["type"]
-            target_table = f"{settings.USER_DATA_SCHEMA}.{SupportedOgrGeomType[geometry_type].value}_{str(self.user_id).replace('-', '')}"
+            target_table = build_user_table_name(
+                settings.USER_DATA_SCHEMA,
+                SupportedOgrGeomType[geometry_type].value,
+                self.user_id,
+            )
 
-        await self.upload_ogr2ogr_fail(temp_table_name)
+        # Drop the temporary table and delete the inserted data in one round trip
+        await self.validate_fail(self.folder_path)
         await self.async_session.execute(
-            text(f"DELETE FROM {target_table} WHERE layer_id = '{str(layer_id)}'")
+            text(
+                f"""
+                DO $$
+                BEGIN
+                    DROP TABLE IF EXISTS {temp_table_name};
+                    DELETE FROM {target_table} WHERE layer_id = '{str(layer_id)}';
+                END $$
+                """
+            )
         )
         await self.async_session.commit()
 
@@ -1,13 +1,17 @@
+import asyncio
+import contextlib
 import io
 import json
+import logging
 import random
-from typing import Dict, List, Union
+import time
+from typing import AsyncIterator, Dict, List, Union
 from urllib.parse import quote
 
 import aiohttp
-import matplotlib.pyplot as plt
 import pandas as pd
 from cairosvg import svg2png
+from matplotlib.figure import Figure
 from PIL import Image
 from pydantic import BaseModel
 from pymgl import Map
@@ -21,6 +25,8 @@ from src.schemas.layer import FeatureType
 from src.schemas.project import InitialViewState
 from src.utils import async_get_with_retry
 
+logger = logging.getLogger(__name__)
+
 basemaps = {
     "streets": "mapbox://styles/mapbox/streets-v12",
     "satellite": "mapbox://styles/mapbox/satellite-v9",
@@ -79,36 +85,20 @@ def get_mapbox_style_color(data: Dict, type: str) -> Union[str, List]:
 
         return ["match", ["get", field_name]] + values_and_colors + ["#AAAAAA"]
 
-    if (
-        not field_name
-        or not colors
-        or len(data["properties"].get(f"{type}_scale_breaks", {}).get("breaks", []))
-        != len(colors) - 1
-    ):
+    breaks = data["properties"].get(f"{type}_scale_breaks", {}).get("breaks", [])
+    if not field_name or not colors or len(breaks) != len(colors) - 1:
         return (
             rgb_to_hex(data["properties"].get(type))
             if data["properties"].get(type)
             else "#000000"
         )
 
-    color_steps = []
-    for index, color in enumerate(colors):
-        if index == len(colors) - 1:
-            color_steps.append([colors[index]])
-        else:
-            color_steps.append(
-                [
-                    color,
-                    data["properties"]
-                    .get(f"{type}_scale_breaks", {})
-                    .get("breaks", [])[index]
-                    or 0,
-                ]
-            )
-
-    config = ["step", ["get", field_name]] + [
-        item for sublist in color_steps for item in sublist
-    ]
+    # Build the flat list of colors and breaks of the step expression in one pass
+    config = ["step", ["get", field_name]]
+    for color, step in zip(colors, breaks, strict=False):
+        config.append(color)
+        config.append(step or 0)
+    config.append(colors[-1])
     return config
 
 
@@ -146,71 +136,191 @@ def get_mapbox_style_marker(data: dict):
     return marker
 
 
-def transform_to_mapbox_layer_style_spec(data: dict) -> dict:
-    type = data.get("feature_layer_geometry_type")
-    if type == "point":
-        point_properties = data.get("properties")
-        # Check if there is a marker field
-        if point_properties.get("custom_marker") is True:
-            style = {
-                "type": "symbol",
-                "layout": {
-                    "icon-image": get_mapbox_style_marker(data),
-                    "icon-size": point_properties["radius"],
-                },
-                "paint": {
-                    "icon-opacity": point_properties.get("opacity", 0),
-                    "icon-color": get_mapbox_style_color(data, "color"),
-                },
-            }
-        else:
-            style = {
-                "type": "circle",
-                "paint": {
-                    "circle-color": get_mapbox_style_color(data, "color"),
-                    "circle-opacity": point_properties.get("filled", False)
-                    * point_properties.get("opacity", 0),
-                    "circle-radius": point_properties.get("radius", 5),
-                    "circle-stroke-color": get_mapbox_style_color(data, "stroke_color"),
-                    "circle-stroke-width": point_properties.get("stroked", False)
-                    * point_properties.get("stroke_width", 1),
-                },
-            }
-        return style
-
-    elif type == "polygon":
-        polygon_properties = data.get("properties")
+def get_mapbox_point_style(data: dict, properties: dict) -> dict:
+    # Check if there is a marker field
+    if properties.get("custom_marker") is True:
         return {
-            "type": "fill",
-            "paint": {
-                "fill-color": get_mapbox_style_color(data, "color"),
-                "fill-opacity": polygon_properties.get("filled", False)
-                * polygon_properties.get("opacity", 0),
-                "fill-outline-color": get_mapbox_style_color(data, "stroke_color"),
-                "fill-antialias": polygon_properties.get("stroked", False),
+            "type": "symbol",
+            "layout": {
+                "icon-image": get_mapbox_style_marker(data),
+                "icon-size": properties["radius"],
             },
-        }
-    elif type == "line":
-        line_properties = data.get("properties")
-        return {
-            "type": "line",
             "paint": {
-                "line-color": get_mapbox_style_color(data, "stroke_color"),
-                "line-opacity": line_properties.get("opacity", 0),
-                "line-width": line_properties.get("stroke_width", 1),
+                "icon-opacity": properties.get("opacity", 0),
+                "icon-color": get_mapbox_style_color(data, "color"),
             },
         }
-    else:
+    return {
+        "type": "circle",
+        "paint": {
+            "circle-color": get_mapbox_style_color(data, "color"),
+            "circle-opacity": properties.get("filled", False)
+            * properties.get("opacity", 0),
+            "circle-radius": properties.get("radius", 5),
+            "circle-stroke-color": get_mapbox_style_color(data, "stroke_color"),
+            "circle-stroke-width": properties.get("stroked", False)
+            * properties.get("stroke_width", 1),
+        },
+    }
+
+
+def get_mapbox_polygon_style(data: dict, properties: dict) -> dict:
+    return {
+        "type": "fill",
+        "paint": {
+            "fill-color": get_mapbox_style_color(data, "color"),
+            "fill-opacity": properties.get("filled", False)
+            * properties.get("opacity", 0),
+            "fill-outline-color": get_mapbox_style_color(data, "stroke_color"),
+            "fill-antialias": properties.get("stroked", False),
+        },
+    }
+
+
+def get_mapbox_line_style(data: dict, properties: dict) -> dict:
+    return {
+        "type": "line",
+        "paint": {
+            "line-color": get_mapbox_style_color(data, "stroke_color"),
+            "line-opacity": properties.get("opacity", 0),
+            "line-width": properties.get("stroke_width", 1),
+        },
+    }
+
+
+# Layer fields read by the style builders, other fields are not copied when converting the layer
+mapbox_style_fields = {"feature_layer_geometry_type", "properties"}
+
+mapbox_style_builders = {
+    "point": get_mapbox_point_style,
+    "polygon": get_mapbox_polygon_style,
+    "line": get_mapbox_line_style,
+}
+
+
+def transform_to_mapbox_layer_style_spec(data: dict) -> dict:
+    type = data.get("feature_layer_geometry_type")
+    builder = mapbox_style_builders.get(type)
+    if builder is None:
         raise ValueError(f"Invalid type: {type}")
+    return builder(data, data.get("properties"))
+
+
+def render_table_thumbnail(
+    data: list, columns_mapped: list, width: int, height: int
+) -> bytes:
+    """Render the rows of a table layer as PNG."""
+
+    # Create a DataFrame
+    df = pd.DataFrame(data, columns=columns_mapped[:4])
+
+    # If the len of the columns exceed 4 then add a column with ...
+    if len(columns_mapped) > 4:
+        df["... "] = "..."
+
+    # Create a figure and an axes without pyplot as its global state is not thread-safe
+    fig = Figure(figsize=(width / 80, height / 80))  # Convert pixels to inches
+    ax = fig.subplots()
+
+    # Remove the axes
+    ax.axis("off")
+
+    # Create a table and add it to the axes
+    table = ax.table(
+        cellText=df.values,
+        colLabels=df.columns,
+        loc="center",
+        cellLoc="center",
+        colWidths=[1] * len(df.columns),  # Make columns of equal size
+        bbox=[0, 0, 1, 1],  # Full height and width with a small padding
+    )
+    table.auto_set_font_size(False)
+    table.set_fontsize(12)
+
+    # Set the color, font weight, and font color of the header cells
+    table_props = table.properties()
+    table_cells = table_props["children"]
+    color = "#535353"
+    for cell in table_cells:
+        if cell.get_text().get_text() in df.columns:
+            cell.set_facecolor(color)
+            cell.get_text().set_fontsize(16)
+            cell.get_text().set_weight("bold")  # Make the text bold
+            cell.get_text().set_color("white")  # Set the font color to white
+
+    # Save the file as bytes and return it
+    image = io.BytesIO()
+    fig.savefig(image, bbox_inches="tight", pad_inches=1)
+    return image.getvalue()
 
 
 class PrintMap:
+    # Loaded maps per style URL with the layers and sources of the bare style
+    _map_pool: Dict[str, List[tuple]] = {}
+    max_pooled_maps = 4
+    # Collections found in geoapi with the time they were found
+    _ready_collections: Dict[str, float] = {}
+    collection_cache_ttl = 600
+    max_ready_collections = 4096
+
     def __init__(self, async_session: AsyncSession):
         self.thumbnail_zoom = 13
         self.thumbnail_height = 280
         self.thumbnail_width = 674
         self.async_session = async_session
 
+    @contextlib.asynccontextmanager
+    async def pooled_map(self, style_url: str) -> AsyncIterator[Map]:
+        """Get a loaded map of the style from the pool or load a new one."""
+
+        pool = self._map_pool.setdefault(style_url, [])
+        if pool:
+            map, base_layers, base_sources = pool.pop()
+        else:
+            map = Map(style_url, provider="mapbox", token=settings.MAPBOX_TOKEN)
+            map.load()
+            base_layers = set(map.listLayers())
+            base_sources = set(map.listSources())
+
+        # Maps failing while rendering are discarded as their state is unknown
+        yield map
+
+        # Reset the map to the bare style before returning it to the pool. Added icons are kept, as adding an icon again replaces it.
+        try:
+            for layer_id in map.listLayers():
+                if layer_id not in base_layers:
+                    map.removeLayer(layer_id)
+            for source_id in map.listSources():
+                if source_id not in base_sources:
+                    map.removeSource(source_id)
+        except Exception as e:
+            logger.error("Error while resetting map: %s", e)
+            return
+        if len(pool) < self.max_pooled_maps:
+            pool.append((map, base_layers, base_sources))
+
+    async def wait_for_collection(self, collection_id: str):
+        """Wait until geoapi serves the collection, collections found recently are not requested again."""
+
+        found_at = self._ready_collections.get(collection_id)
+        if (
+            found_at is not None
+            and time.monotonic() - found_at < self.collection_cache_ttl
+        ):
+            return
+
+        # Request in recursive loop if layer was already added in geoapi if it does not fail the layer was added
+        header = {"Content-Type": "application/json"}
+        await async_get_with_retry(
+            url=f"{settings.GOAT_GEOAPI_HOST}/collections/" + collection_id,
+            headers=header,
+            num_retries=10,
+            retry_delay=1,
+        )
+        if len(self._ready_collections) >= self.max_ready_collections:
+            self._ready_collections.clear()
+        self._ready_collections[collection_id] = time.monotonic()
+
     async def add_icons_to_map(self, map: Map, layer: Layer):
         """Add icons to map."""
 
@@ -291,141 +401,131 @@ class PrintMap:
         dir = settings.THUMBNAIL_DIR_LAYER + "/" + file_name
         url = settings.ASSETS_URL + "/" + dir
 
-        # Save to s3
-        settings.S3_CLIENT.upload_fileobj(
-            Fileobj=image,
+        # Save to s3 in a worker thread as the boto3 client blocks on network I/O
+        await asyncio.to_thread(
+            settings.S3_CLIENT.put_object,
+            Body=image,
             Bucket=settings.AWS_S3_ASSETS_BUCKET,
             Key=dir,
-            ExtraArgs={"ContentType": "image/png"},
-            Callback=None,
-            Config=None,
+            ContentType="image/png",
         )
         return url
 
-    async def create_raster_layer_thumbnail(self, layer: Layer) -> io.BytesIO:
+    async def create_raster_layer_thumbnail(self, layer: Layer) -> bytes:
         """Create raster layer thumbnail."""
 
-        # Define map
-        map = Map(basemaps["light"], provider="mapbox", token=settings.MAPBOX_TOKEN)
-        map.load()
+        # Get a loaded map from the pool
+        async with self.pooled_map(basemaps["light"]) as map:
 
-        # Set map extent
-        if layer.extent and layer.extent.data:
-            geom_shape = from_wkb(layer.extent.data)
-            xmin, ymin, xmax, ymax = geom_shape.bounds
-        else:
-            # Define global extent
-            xmin, ymin, xmax, ymax = -180.0, -90.0, 180.0, 90.0
-
-        map.setBounds(
-            xmin=xmin,
-            ymin=ymin,
-            xmax=xmax,
-            ymax=ymax,
-        )
-        map.setSize(self.thumbnail_width, self.thumbnail_height)
+            # Set map extent
+            if layer.extent and layer.extent.data:
+                xmin, ymin, xmax, ymax = from_wkb(layer.extent.data).bounds
+            else:
+                # Define global extent
+                xmin, ymin, xmax, ymax = -180.0, -90.0, 180.0, 90.0
+
+            map.setBounds(
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
+            )
+            map.setSize(self.thumbnail_width, self.thumbnail_height)
 
-        map.addSource(
-            layer.name,
-            json.dumps(
-                {
-                    "type": "raster",
-                    "tileSize": getattr(layer, "other_properties", {}).get(
-                        "tileSize", 256
-                    ),
-                    "tiles": [layer.url],
-                }
-            ),
-        )
-        # Add layer
-        map.addLayer(
-            json.dumps(
-                {
-                    "id": layer.name,
-                    "type": "raster",
-                    "source": layer.name,
-                    "source-layer": "default",
-                    "layout": {
-                        "visibility": "visible",
-                    },
-                    "paint": {
-                        "raster-opacity": layer.properties.get("opacity", 1),
-                    },
-                }
+            map.addSource(
+                layer.name,
+                json.dumps(
+                    {
+                        "type": "raster",
+                        "tileSize": getattr(layer, "other_properties", {}).get(
+                            "tileSize", 256
+                        ),
+                        "tiles": [layer.url],
+                    }
+                ),
+            )
+            # Add layer
+            map.addLayer(
+                json.dumps(
+                    {
+                        "id": layer.name,
+                        "type": "raster",
+                        "source": layer.name,
+                        "source-layer": "default",
+                        "layout": {
+                            "visibility": "visible",
+                        },
+                        "paint": {
+                            "raster-opacity": layer.properties.get("opacity", 1),
+                        },
+                    }
+                )
             )
-        )
 
-        img_bytes = map.renderPNG()
-        image = io.BytesIO(img_bytes)
+            image = map.renderPNG()
         return image
 
-    async def create_feature_layer_thumbnail(self, layer: Layer) -> io.BytesIO:
+    async def create_feature_layer_thumbnail(self, layer: Layer) -> bytes:
         """Create feature layer thumbnail."""
 
-        # Define map
-        map = Map(basemaps["light"], provider="mapbox", token=settings.MAPBOX_TOKEN)
-        map.load()
-
-        # Set map extent
-        geom_shape = from_wkb(layer.extent.data)
-        map.setBounds(
-            xmin=geom_shape.bounds[0],
-            ymin=geom_shape.bounds[1],
-            xmax=geom_shape.bounds[2],
-            ymax=geom_shape.bounds[3],
-        )
-        map.setSize(self.thumbnail_width, self.thumbnail_height)
+        # Get a loaded map from the pool
+        async with self.pooled_map(basemaps["light"]) as map:
 
-        # Transform layer to mapbox style
-        style = transform_to_mapbox_layer_style_spec(layer.dict())
+            # Set map extent
+            xmin, ymin, xmax, ymax = from_wkb(layer.extent.data).bounds
+            map.setBounds(
+                xmin=xmin,
+                ymin=ymin,
+                xmax=xmax,
+                ymax=ymax,
+            )
+            map.setSize(self.thumbnail_width, self.thumbnail_height)
 
-        # Add icons to map in case of icon style
-        if style["type"] == "symbol":
-            map = await self.add_icons_to_map(map, layer)
+            # Transform layer to mapbox style
+            style = transform_to_mapbox_layer_style_spec(
+                layer.dict(include=mapbox_style_fields)
+            )
 
-        # Get collection id
-        layer_id = layer.id
-        collection_id = "user_data." + str(layer_id).replace("-", "")
+            # Add icons to map in case of icon style
+            if style["type"] == "symbol":
+                map = await self.add_icons_to_map(map, layer)
 
-        # Request in recursive loop if layer was already added in geoapi if it does not fail the layer was added
-        header = {"Content-Type": "application/json"}
-        await async_get_with_retry(
-            url=f"{settings.GOAT_GEOAPI_HOST}/collections/" + collection_id,
-            headers=header,
-            num_retries=10,
-            retry_delay=1,
-        )
+            # Get collection id
+            layer_id = layer.id
+            collection_id = "user_data." + str(layer_id).replace("-", "")
 
-        # Add layer source
-        tile_url = (
-            f"{settings.GOAT_GEOAPI_HOST}/collections/"
-            + collection_id
-            + "/tiles/{z}/{x}/{y}"
-        )
-        map.addSource(
-            layer.name,
-            json.dumps(
-                {
-                    "type": "vector",
-                    "tiles": [tile_url],
-                }
-            ),
-        )
-        # Add layer
-        layer = {
-            "id": layer.name,
-            "type": style["type"],
-            "source": layer.name,
-            "source-layer": "default",
-            "paint": style["paint"],
-        }
-        if style.get("layout"):
-            layer["layout"] = style["layout"]
+            # Wait until the layer was added in geoapi
+            await self.wait_for_collection(collection_id)
 
-        map.addLayer(json.dumps(layer))
+            # Add layer source
+            tile_url = (
+                f"{settings.GOAT_GEOAPI_HOST}/collections/"
+                + collection_id
+                + "/tiles/{z}/{x}/{y}"
+            )
+            map.addSource(
+                layer.name,
+                json.dumps(
+                    {
+                        "type": "vector",
+                        "tiles": [tile_url],
+                    }
+                ),
+            )
+            # Add layer
+            layer = {
+                "id": layer.name,
+                "type": style["type"],
+                "source": layer.name,
+                "source-layer": "default",
+                "paint": style["paint"],
+            }
+            if style.get("layout"):
+                layer["layout"] = style["layout"]
+
+            map.addLayer(json.dumps(layer))
 
-        img_bytes = map.renderPNG()
-        image = io.BytesIO(img_bytes)
+            image = map.renderPNG()
 
         return image
 
@@ -466,49 +566,14 @@ class PrintMap:
                 if len(str(cell)) > 15:
                     row[index] = str(cell)[:15] + "..."
 
-        # Create a DataFrame
-        df = pd.DataFrame(data, columns=columns_mapped[:4])
-
-        # If the len of the columns exceed 4 then add a column with ...
-        if len(columns_mapped) > 4:
-            df["... "] = "..."
-
-        # Create a figure and an axes
-        fig, ax = plt.subplots(
-            figsize=(self.thumbnail_width / 80, self.thumbnail_height / 80)
-        )  # Convert pixels to inches
-
-        # Remove the axes
-        ax.axis("off")
-
-        # Create a table and add it to the axes
-        table = plt.table(
-            cellText=df.values,
-            colLabels=df.columns,
-            loc="center",
-            cellLoc="center",
-            colWidths=[1] * len(df.columns),  # Make columns of equal size
-            bbox=[0, 0, 1, 1],  # Full height and width with a small padding
+        # Render the table in a worker thread as matplotlib blocks while drawing
+        return await asyncio.to_thread(
+            render_table_thumbnail,
+            data,
+            columns_mapped,
+            self.thumbnail_width,
+            self.thumbnail_height,
         )
-        table.auto_set_font_size(False)
-        table.set_fontsize(12)
-
-        # Set the color, font weight, and font color of the header cells
-        table_props = table.properties()
-        table_cells = table_props["children"]
-        color = "#535353"
-        for cell in table_cells:
-            if cell.get_text().get_text() in df.columns:
-                cell.set_facecolor(color)
-                cell.get_text().set_fontsize(16)
-                cell.get_text().set_weight("bold")  # Make the text bold
-                cell.get_text().set_color("white")  # Set the font color to white
-
-        # Save the file as bytes and return it
-        image = io.BytesIO()
-        fig.savefig(image, bbox_inches="tight", pad_inches=1)
-        image.seek(0)
-        return image
 
     async def create_project_thumbnail(
         self,
@@ -526,134 +591,131 @@ class PrintMap:
         else:
             style_url = basemaps["streets"]
 
-        # Define map
-        map = Map(style_url, provider="mapbox", token=settings.MAPBOX_TOKEN)
-        map.load()
-
-        # Set map extent
-        map.setCenter(initial_view_state["longitude"], initial_view_state["latitude"])
-        map.setZoom(initial_view_state["zoom"])
-        map.setSize(self.thumbnail_width, self.thumbnail_height)
+        # Get a loaded map from the pool
+        async with self.pooled_map(style_url) as map:
 
-        # Sort layer_project by layer order
-        if len(layers_project) > 1:
-            layers_project.sort(
-                key=lambda x: project.layer_order.index(x.id), reverse=True
+            # Set map extent
+            map.setCenter(
+                initial_view_state["longitude"], initial_view_state["latitude"]
             )
+            map.setZoom(initial_view_state["zoom"])
+            map.setSize(self.thumbnail_width, self.thumbnail_height)
 
-        for layer in layers_project:
-            if (
-                layer.properties["visibility"] is False
-                or layer.properties["visibility"] is None
-            ):
-                continue
-
-            if (
-                layer.type == LayerType.feature
-                and layer.feature_layer_type != FeatureType.street_network
-            ):
-                # Get collection id
-                layer_id = layer.layer_id
-                collection_id = "user_data." + str(layer_id).replace("-", "")
-
-                # Request in recursive loop if layer was already added in geoapi if it does not fail the layer was added
-                header = {"Content-Type": "application/json"}
-                await async_get_with_retry(
-                    url=f"{settings.GOAT_GEOAPI_HOST}/collections/" + collection_id,
-                    headers=header,
-                    num_retries=10,
-                    retry_delay=1,
+            # Sort layer_project by layer order
+            if len(layers_project) > 1:
+                layers_project.sort(
+                    key=lambda x: project.layer_order.index(x.id), reverse=True
                 )
 
-                # Transform style
-                style = transform_to_mapbox_layer_style_spec(layer.dict())
+            for layer in layers_project:
+                if (
+                    layer.properties["visibility"] is False
+                    or layer.properties["visibility"] is None
+                ):
+                    continue
+
+                if (
+                    layer.type == LayerType.feature
+                    and layer.feature_layer_type != FeatureType.street_network
+                ):
+                    # Get collection id
+                    layer_id = layer.layer_id
+                    collection_id = "user_data." + str(layer_id).replace("-", "")
+
+                    # Wait until the layer was added in geoapi
+                    await self.wait_for_collection(collection_id)
+
+                    # Transform style
+                    style = transform_to_mapbox_layer_style_spec(
+                        layer.dict(include=mapbox_style_fields)
+                    )
 
-                cql_filter = ""
+                    cql_filter = ""
 
-                if layer.query and layer.query.cql:
-                    json_cql_str = json.dumps(layer.query.cql)
-                    cql_filter = f"?filter={quote(json_cql_str)}"
+                    if layer.query and layer.query.cql:
+                        json_cql_str = json.dumps(layer.query.cql)
+                        cql_filter = f"?filter={quote(json_cql_str)}"
 
-                # Add layer source
-                tile_url = (
-                    f"{settings.GOAT_GEOAPI_HOST}/collections/"
-                    + collection_id
-                    + "/tiles/{z}/{x}/{y}"
-                    + cql_filter
-                )
+                    # Add layer source
+                    tile_url = (
+                        f"{settings.GOAT_GEOAPI_HOST}/collections/"
+                        + collection_id
+                        + "/tiles/{z}/{x}/{y}"
+                        + cql_filter
+                    )
 
-                map.addSource(
-                    layer.name,
-                    json.dumps(
-                        {
-                            "type": "vector",
-                            "tiles": [tile_url],
-                        }
-                    ),
-                )
-                # Add layer
-                map.addLayer(
-                    json.dumps(
-                        {
-                            "id": layer.name,
-                            "type": style["type"],
-                            "source": layer.name,
-                            "source-layer": "default",
-                            "paint": style["paint"],
-                        }
+                    map.addSource(
+                        layer.name,
+                        json.dumps(
+                            {
+                                "type": "vector",
+                                "tiles": [tile_url],
+                            }
+                        ),
                     )
-                )
-            elif layer.type == LayerType.raster:
-                # Add raster layer source
-                map.addSource(
-                    layer.name,
-                    json.dumps(
-                        {
-                            "type": "raster",
-                            "tileSize": getattr(layer, "other_properties", {}).get(
-                                "tileSize", 256
-                            ),
-                            "tiles": [layer.url],
-                        }
-                    ),
-                )
-                # Add raster layer
-                map.addLayer(
-                    json.dumps(
-                        {
-                            "id": layer.name,
-                            "type": "raster",
-                            "source": layer.name,
-                            "source-layer": "default",
-                            "layout": {
-                                "visibility": "visible",
-                            },
-                            "paint": {
-                                "raster-opacity": layer.properties.get("opacity", 1),
-                            },
-                        }
+                    # Add layer
+                    map.addLayer(
+                        json.dumps(
+                            {
+                                "id": layer.name,
+                                "type": style["type"],
+                                "source": layer.name,
+                                "source-layer": "default",
+                                "paint": style["paint"],
+                            }
+                        )
                     )
-                )
-        # img_bytes = map.renderPNG()
-        try:
-            img_bytes = map.renderPNG()
-        except RuntimeError as e:
-            print("Error while rendering PNG:", e)
-            print("Map state:", map.getState())
-            raise
-        image = io.BytesIO(img_bytes)
+                elif layer.type == LayerType.raster:
+                    # Add raster layer source
+                    map.addSource(
+                        layer.name,
+                        json.dumps(
+                            {
+                                "type": "raster",
+                                "tileSize": getattr(layer, "other_properties", {}).get(
+                                    "tileSize", 256
+                                ),
+                                "tiles": [layer.url],
+                            }
+                        ),
+                    )
+                    # Add raster layer
+                    map.addLayer(
+                        json.dumps(
+                            {
+                                "id": layer.name,
+                                "type": "raster",
+                                "source": layer.name,
+                                "source-layer": "default",
+                                "layout": {
+                                    "visibility": "visible",
+                                },
+                                "paint": {
+                                    "raster-opacity": layer.properties.get(
+                                        "opacity", 1
+                                    ),
+                                },
+                            }
+                        )
+                    )
+            # img_bytes = map.renderPNG()
+            try:
+                image = map.renderPNG()
+            except RuntimeError as e:
+                print("Error while rendering PNG:", e)
+                print("Map state:", map.getState())
+                raise
 
         # Save image to s3 bucket using s3 client from settings
         dir = settings.THUMBNAIL_DIR_PROJECT + "/" + file_name
         url = settings.ASSETS_URL + "/" + dir
 
-        # Save to s3
-        settings.S3_CLIENT.upload_fileobj(
-            Fileobj=image,
+        # Save to s3 in a worker thread as the boto3 client blocks on network I/O
+        await asyncio.to_thread(
+            settings.S3_CLIENT.put_object,
+            Body=image,
             Bucket=settings.AWS_S3_ASSETS_BUCKET,
             Key=dir,
-            ExtraArgs={"ContentType": "image/png"},
-            Callback=None,
-            Config=None,
+            ContentType="image/png",
         )
         return url
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic import BaseModel
 
 from src.schemas.error import (
@@ -14,6 +16,39 @@ from src.schemas.toolbox_base import (
 from src.utils import search_value
 
 
+@lru_cache(maxsize=256)
+def build_statistics_sql(
+    field: str | None,
+    operation: ColumnStatisticsOperation,
+    cast: str | None = None,
+    count_as_sum: bool = False,
+) -> str:
+    """Build the aggregation of a statistics field. The field can be cast to another type and count can be replaced by sum, e.g. for already counted values."""
+
+    if field and cast:
+        field = f"({field})::{cast}"
+
+    if operation == ColumnStatisticsOperation.count and count_as_sum:
+        operation = ColumnStatisticsOperation.sum
+
+    if operation == ColumnStatisticsOperation.count:
+        query = f"COUNT({field})" if field else "COUNT(*)"
+    elif operation == ColumnStatisticsOperation.sum:
+        query = f"SUM({field})"
+    # elif operation == ColumnStatisticsOperation.mean:
+    #     query = f"AVG({field})"
+    # elif operation == ColumnStatisticsOperation.median:
+    #     query = f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {field})"
+    elif operation == ColumnStatisticsOperation.min:
+        query = f"MIN({field})"
+    elif operation == ColumnStatisticsOperation.max:
+        query = f"MAX({field})"
+    else:
+        raise ValueError(f"Unsupported operation {operation}")
+
+    return query
+
+
 class StatisticsBase:
     """Helper functions that support statistical operations for endpoints."""
 
@@ -28,27 +63,14 @@ class StatisticsBase:
         self,
         field: str | None,
         operation: ColumnStatisticsOperation,
+        cast: str | None = None,
+        count_as_sum: bool = False,
     ):
         # Parse pseudo columns when a column name is supplied
         if field:
             field = self.convert_geom_measurement_field(field)
 
-        if operation == ColumnStatisticsOperation.count:
-            query = f"COUNT({field})" if field else "COUNT(*)"
-        elif operation == ColumnStatisticsOperation.sum:
-            query = f"SUM({field})"
-        # elif operation == ColumnStatisticsOperation.mean:
-        #     query = f"AVG({field})"
-        # elif operation == ColumnStatisticsOperation.median:
-        #     query = f"PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY {field})"
-        elif operation == ColumnStatisticsOperation.min:
-            query = f"MIN({field})"
-        elif operation == ColumnStatisticsOperation.max:
-            query = f"MAX({field})"
-        else:
-            raise ValueError(f"Unsupported operation {operation}")
-
-        return query
+        return build_statistics_sql(field, operation, cast, count_as_sum)
 
     async def check_column_statistics(
         self,
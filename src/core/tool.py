@@ -5,6 +5,7 @@ from fastapi import BackgroundTasks
 from fastapi_pagination import Params as PaginationParams
 from httpx import AsyncClient
 from pydantic import BaseModel
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import SQLModel
 
@@ -41,16 +42,17 @@ from src.schemas.style import (
 )
 from src.schemas.tool import IToolParam
 from src.schemas.toolbox_base import (
-    ColumnStatisticsOperation,
     DefaultResultLayerName,
     GeofenceTable,
     MaxFeatureCnt,
     MaxFeaturePolygonArea,
 )
 from src.utils import (
+    build_where,
     build_where_clause,
     format_value_null_sql,
     get_random_string,
+    quote_identifier,
     search_value,
 )
 
@@ -438,13 +440,28 @@ class CRUDToolBase(StatisticsBase, CRUDFailedJob):
                     f"The operation cannot be performed on more than {MaxFeatureCnt[tool_type.value].value} features."
                 )
 
+    def build_reference_area_where(
+        self, layer_project: BaseModel | SQLModel | dict
+    ) -> tuple[str, dict]:
+        """Build the where clause of the reference layer with the layer ID and the filter values passed as bind parameters."""
+
+        params = {}
+        where_query = build_where(
+            id=layer_project.layer_id,
+            table_name=layer_project.table_name,
+            query=layer_project.query,
+            attribute_mapping=layer_project.attribute_mapping,
+            params=params,
+        )
+        return build_where_clause([where_query]), params
+
     async def check_reference_area_size(
         self,
         layer_project: BaseModel | SQLModel | dict,
         tool_type: ToolType,
     ):
         # Build where query for layer
-        where_query = build_where_clause([layer_project.where_query])
+        where_query, params = self.build_reference_area_where(layer_project)
 
         # Check if layer has polygon geoms
         if (
@@ -455,24 +472,26 @@ class CRUDToolBase(StatisticsBase, CRUDFailedJob):
                 "Operation not supported. The layer does not contain polygon geometries. Pick a layer with polygon geometries."
             )
 
-        # Call SQL function
-        sql_query = """
-            SELECT *
-            FROM basic.area_statistics(:operation, :table_name, :where_query)
+        # Sum up the area row by row and stop as soon as the maximum area is exceeded. Otherwise the last row holds the total area.
+        max_area = MaxFeaturePolygonArea[tool_type.value].value
+        sql_query = f"""
+            SELECT area
+            FROM (
+                SELECT SUM(ST_AREA(geom::geography)) OVER (ROWS UNBOUNDED PRECEDING) AS area,
+                LEAD(1) OVER () IS NULL AS is_last
+                FROM {quote_identifier(layer_project.table_name)}
+                {where_query}
+            ) running_area
+            WHERE area > :max_area OR is_last
+            LIMIT 1
         """
         res = await self.async_session.execute(
-            sql_query,
-            {
-                "operation": ColumnStatisticsOperation.sum.value,
-                "table_name": layer_project.table_name,
-                "where_query": where_query,
-            },
+            text(sql_query), {**params, "max_area": max_area * 1000000}
         )
-        res = res.fetchall()
-        area = res[0][0]["sum"] / 1000000
-        if area > MaxFeaturePolygonArea[tool_type.value].value:
+        area = (res.scalar() or 0) / 1000000
+        if area > max_area:
             raise AreaSizeError(
-                f"The operation cannot be performed on more than {MaxFeaturePolygonArea[tool_type.value].value} km2."
+                f"The operation cannot be performed on more than {max_area} km2."
             )
         return area
 
@@ -482,14 +501,14 @@ class CRUDToolBase(StatisticsBase, CRUDFailedJob):
         tool_type: MaxFeaturePolygonArea,
     ):
         # Build where query for layer
-        where_query = build_where_clause([layer_project.where_query])
-        geofence_table = GeofenceTable[tool_type.value].value
+        where_query, params = self.build_reference_area_where(layer_project)
+        geofence_table = quote_identifier(GeofenceTable[tool_type.value].value)
         # Check if layer has polygon geoms
         sql = f"""
             WITH to_test AS
             (
                 SELECT *
-                FROM {layer_project.table_name}
+                FROM {quote_identifier(layer_project.table_name)}
                 {where_query}
             )
             SELECT COUNT(*)
@@ -501,7 +520,7 @@ class CRUDToolBase(StatisticsBase, CRUDFailedJob):
             )
         """
         # Execute query
-        cnt_not_within = await self.async_session.execute(sql)
+        cnt_not_within = await self.async_session.execute(text(sql), params)
         cnt_not_within = cnt_not_within.scalar()
 
         if cnt_not_within > 0:
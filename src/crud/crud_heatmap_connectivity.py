@@ -1,6 +1,7 @@
 from uuid import UUID
 
 from pydantic import BaseModel
+from sqlalchemy import text
 
 from src.core.config import settings
 from src.core.job import job_init, job_log, run_background_or_immediately
@@ -16,7 +17,22 @@ from src.schemas.heatmap import (
 from src.schemas.job import JobStatusType
 from src.schemas.layer import FeatureGeometryType, IFeatureLayerToolCreate
 from src.schemas.toolbox_base import DefaultResultLayerName
-from src.utils import format_value_null_sql
+
+
+CREATE_REFERENCE_AREA_TABLE_SQL = text(
+    """
+    SELECT basic.create_heatmap_connectivity_reference_area_table(
+        :layer_project_id,
+        :table_name,
+        :customer_schema,
+        :scenario_id,
+        :where_query,
+        :result_table_name,
+        :grid_resolution,
+        :append_existing
+    )
+    """
+)
 
 
 class CRUDHeatmapConnectivity(CRUDToolBase):
@@ -34,18 +50,19 @@ class CRUDHeatmapConnectivity(CRUDToolBase):
         # Create temp table name for points
         temp_points = await self.create_temp_table_name("points")
 
-        # Create distributed point table using sql
+        # Create distributed point table using sql. The values are passed as bind parameters so the statement is the same for every reference area.
         await self.async_session.execute(
-            f"""SELECT basic.create_heatmap_connectivity_reference_area_table(
-                {layer_project.id},
-                '{layer_project.table_name}',
-                '{settings.CUSTOMER_SCHEMA}',
-                {format_value_null_sql(scenario_id)},
-                '{layer_project.where_query.replace("'", "''")}',
-                '{temp_points}',
-                {TRAVELTIME_MATRIX_RESOLUTION[routing_type]},
-                {False}
-            )"""
+            CREATE_REFERENCE_AREA_TABLE_SQL,
+            {
+                "layer_project_id": layer_project.id,
+                "table_name": layer_project.table_name,
+                "customer_schema": settings.CUSTOMER_SCHEMA,
+                "scenario_id": str(scenario_id) if scenario_id else None,
+                "where_query": layer_project.where_query,
+                "result_table_name": temp_points,
+                "grid_resolution": TRAVELTIME_MATRIX_RESOLUTION[routing_type],
+                "append_existing": False,
+            },
         )
         await self.async_session.commit()
 
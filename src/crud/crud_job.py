@@ -1,12 +1,13 @@
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 from typing import List
 from uuid import UUID
 
 from fastapi import HTTPException, status
 from fastapi_pagination import Params as PaginationParams
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, func, select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.sql.elements import TextClause
 
 from src.core.config import settings
 from src.crud.base import CRUDBase
@@ -17,6 +18,43 @@ from src.schemas.error import ERROR_MAPPING, UnknownError
 from src.utils import sanitize_error_message
 
 
+@lru_cache(maxsize=8)
+def get_update_status_sql(schema: str) -> TextClause:
+    """Build the statement updating a job step. It is cached per schema so every job step uses the same prepared statement."""
+
+    # A job that was killed in the meantime keeps its killed status
+    # The fields of the step are merged in one JSONB patch so the status document is only rewritten once
+    return text(
+        f"""
+        UPDATE {schema}.job
+        SET status = jsonb_set(
+                status,
+                ARRAY[CAST(:job_step_name AS text)],
+                COALESCE(status -> CAST(:job_step_name AS text), '{{}}'::jsonb)
+                || CASE WHEN status_simple = 'killed'
+                THEN jsonb_build_object(
+                    'status', 'killed',
+                    'timestamp_end', CAST(:timestamp_end AS text),
+                    'msg', jsonb_build_object('type', 'info', 'text', 'Job was killed.')
+                )
+                ELSE jsonb_build_object(
+                    'status', CAST(:status AS text),
+                    'timestamp_end', CAST(:timestamp_end AS text),
+                    'msg', jsonb_build_object(
+                        'type', CAST(:msg_type AS text), 'text', CAST(:msg_text AS text)
+                    )
+                ) END
+            ),
+            status_simple = CASE WHEN status_simple = 'killed'
+                THEN status_simple ELSE CAST(:status_simple AS text) END,
+            msg_simple = COALESCE(CAST(:msg_simple AS text), msg_simple),
+            updated_at = :updated_at
+        WHERE id = :job_id
+        RETURNING id, status_simple, msg_simple
+        """
+    )
+
+
 class CRUDJob(CRUDBase):
     async def check_and_create(
         self,
@@ -75,31 +113,17 @@ class CRUDJob(CRUDBase):
         status: JobStatusType = JobStatusType.running,
         error=None,
         msg_text: str = "",
+        commit: bool = True,
     ):
-        """Update job status."""
-
-        # TODO: Find another way to avoid refetching the job again here.
-        # Get job and check if job is killed. This is needed at the moment as the job is not updated in here but in the DB.
-        job = await self.get(db=async_session, id=job_id)
-        async_session.expire(job)
-        job = await self.get(db=async_session, id=job_id)
-
-        # Update job step
-        job.status[job_step_name]["timestamp_end"] = str(datetime.now())
-        job.status[job_step_name]["status"] = status
-
-        # Populate job step msg
-        msg_text = sanitize_error_message(msg_text.replace("'", "''"))
-        job.status[job_step_name]["msg"] = {
-            "type": MsgType.info.value,
-            "text": msg_text,
-        }
+        """Update job status. The engine runs in AUTOCOMMIT mode, so the update is visible right away and the commit can be skipped if there is no pending work in the session."""
+
         if status == JobStatusType.finished:
-            job.status_simple = JobStatusType.running.value
+            status_simple = JobStatusType.running.value
         else:
-            job.status_simple = status
+            status_simple = status
 
         # If error is not None population msg_simple
+        msg_simple = None
         if status == JobStatusType.failed:
             if error is None:
                 error = UnknownError("Unknown error occurred.")
@@ -109,15 +133,44 @@ class CRUDJob(CRUDBase):
                     error = UnknownError("Unknown error occurred.")
             error_name = error.__class__.__name__
             error_message = str(error)
-            job.msg_simple = f"{error_name}: {error_message}"
-            flag_modified(job, "msg_simple")
+            msg_simple = f"{error_name}: {error_message}"
+
+        # Take the end of the step and the update time of the job from the same timestamp
+        now = datetime.now(timezone.utc)
+        result = await async_session.execute(
+            get_update_status_sql(settings.CUSTOMER_SCHEMA),
+            {
+                "job_id": job_id,
+                "job_step_name": job_step_name,
+                "status": JobStatusType(status).value,
+                "status_simple": JobStatusType(status_simple).value,
+                "timestamp_end": str(now),
+                "msg_type": MsgType.info.value,
+                "msg_text": sanitize_error_message(msg_text),
+                "msg_simple": msg_simple,
+                "updated_at": now,
+            },
+        )
+        job = result.one()
+        if commit:
+            await async_session.commit()
+        return job
 
-        flag_modified(job, "status")
-        flag_modified(job, "status_simple")
+    async def update_status_simple(
+        self,
+        async_session: AsyncSession,
+        job_id: UUID,
+        status_simple: JobStatusType,
+        **values,
+    ):
+        """Update the simple status and further fields of a job without reading it first."""
 
-        # Update job
-        job = await self.update(db=async_session, db_obj=job)
-        return job
+        await async_session.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(status_simple=JobStatusType(status_simple).value, **values)
+        )
+        await async_session.commit()
 
     async def get_by_date(
         self,
@@ -840,6 +840,7 @@ class CRUDLayerImport(CRUDFailedJob):
         result = await ogr_file_upload.upload_ogr2ogr(
             temp_table_name=self.temp_table_name,
             job_id=self.job_id,
+            validation_result=file_metadata,
         )
         # Migrate temporary table to target table
         result = await ogr_file_upload.migrate_target_table(
@@ -986,7 +987,7 @@ class CRUDLayerExport:
         )
 
         # Delete files that are older then one hour
-        await delete_old_files(3600)
+        await delete_old_files(7200)
 
         # Initialize OGRFileHandling
         ogr_file_handling = OGRFileHandling(
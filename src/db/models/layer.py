@@ -6,7 +6,7 @@ import pycountry
 from geoalchemy2 import Geometry, WKBElement
 from geoalchemy2.shape import to_shape
 from pydantic import BaseModel, EmailStr, HttpUrl, validator
-from sqlalchemy import text
+from sqlalchemy import Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import UUID as UUID_PG
 from sqlmodel import (
@@ -476,4 +476,12 @@ class Layer(LayerBase, GeospatialAttributes, DateTimeBase, table=True):
 
 # Constraints
 UniqueConstraint(Layer.__table__.c.folder_id, Layer.__table__.c.name)
+
+# Indexes
+Index(
+    "ix_layer_folder_id_name_pattern",
+    Layer.__table__.c.folder_id,
+    Layer.__table__.c.name,
+    postgresql_ops={"name": "text_pattern_ops"},
+)
 Layer.update_forward_refs()
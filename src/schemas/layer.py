@@ -74,10 +74,11 @@ class OgrDriverType(str, Enum):
     """OGR driver types."""
 
     geojson = "GeoJSON"
-    csv = "CSV"  # Using XLSX driver for CSV files as the file is converted to XLSX to keep data types
+    csv = "CSV"
     xlsx = "XLSX"
     gpkg = "GPKG"
     kml = "KML"
+    vrt = "OGR_VRT"  # Using VRT driver for CSV files as the file is read through a VRT to detect data types
     shp = "ESRI Shapefile"  # Using SHP driver for ZIP files as the file is converted to SHP to keep data types
     zip = "ESRI Shapefile"  # Using SHP driver for ZIP files as the file is converted to SHP to keep data types
 
@@ -191,6 +192,7 @@ class IFileUploadMetadata(BaseModel):
     file_ending: str = Field(..., description="File ending", max_length=500)
     file_size: int = Field(..., description="File size")
     file_path: str = Field(..., description="File path", max_length=500)
+    layer_name: str | None = Field(None, description="Name of the layer in the file")
     dataset_id: UUID = Field(..., description="Dataset ID")
     msg: Msg = Field(..., description="Response Message")
 
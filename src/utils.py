@@ -25,7 +25,11 @@ from geojson import Feature, FeatureCollection
 from geojson import loads as geojsonloads
 from numba import njit
 from pydantic import BaseModel
+from pygeofilter import ast as cql_ast
+from pygeofilter import values as cql_values
+from pygeofilter.backends.evaluator import handle
 from pygeofilter.backends.sql import to_sql_where
+from pygeofilter.backends.sql.evaluate import SQLEvaluator
 from pygeofilter.parsers.cql2_json import parse as cql2_json_parser
 from rich import print as print
 from sqlalchemy import func, select, text
@@ -361,14 +365,22 @@ def zip_directory(output_filename, directory):
                 )
 
 
-def execute_cmd(cmd):
-    subprocess.run(cmd, shell=True, check=True)
+async def async_run_command(cmd: str | list[str]):
+    """Run a command as subprocess without blocking the event loop or a worker thread. Commands passed as argument list are run without a shell."""
+    if isinstance(cmd, str):
+        process = await asyncio.create_subprocess_shell(cmd)
+    else:
+        process = await asyncio.create_subprocess_exec(*cmd)
 
+    try:
+        returncode = await process.wait()
+    except asyncio.CancelledError:
+        # Stop the command if the task is cancelled e.g. by a timeout
+        process.kill()
+        raise
 
-async def async_run_command(cmd):
-    loop = asyncio.get_event_loop()
-    result = await loop.run_in_executor(None, execute_cmd, cmd)
-    return result
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
 
 
 async def check_file_size(file: UploadFile, max_size: int) -> bool:
@@ -395,6 +407,23 @@ def search_value(d, target) -> str:
     raise ValueError(f"{target} is not in the dictionary")
 
 
+def search_values(d, targets) -> list[str]:
+    """Search the keys of several values with a single pass over the dictionary."""
+    # Iterate in reverse so the first key wins for duplicated values as in search_value
+    keys = {value: key for key, value in reversed(d.items())}
+    for target in targets:
+        if target not in keys:
+            raise ValueError(f"{target} is not in the dictionary")
+    return [keys[target] for target in targets]
+
+
+def quote_identifier(identifier: str) -> str:
+    """Quote a (optionally schema qualified) identifier for use in raw SQL."""
+    return ".".join(
+        '"' + part.replace('"', '""') + '"' for part in identifier.split(".")
+    )
+
+
 def next_column_name(attribute_mapping: dict, data_type: str):
     attributes = attribute_mapping.keys()
     # Regular expression to find attributes with the given data type and a number
@@ -444,18 +473,55 @@ def get_result_column(
         return {mapped_column: base_column_name}
 
 
+class SQLBindEvaluator(SQLEvaluator):
+    """Translate a CQL filter to SQL and pass the string literals as bind parameters."""
+
+    def __init__(self, attribute_map: dict, params: dict):
+        super().__init__(attribute_map, {})
+        self.params = params
+
+    def bind(self, value) -> str:
+        name = f"cql_{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    @handle(cql_ast.Like)
+    def like(self, node, lhs):
+        pattern = node.pattern
+        if node.wildcard != "%":
+            pattern = pattern.replace(node.wildcard, "%")
+        if node.singlechar != "_":
+            pattern = pattern.replace(node.singlechar, "_")
+        return (
+            f"{lhs} {'NOT ' if node.not_ else ''}LIKE "
+            f"{self.bind(pattern)} ESCAPE {self.bind(node.escapechar)}"
+        )
+
+    @handle(*cql_values.LITERALS)
+    def literal(self, node):
+        if isinstance(node, str):
+            return self.bind(node)
+        return super().literal(node)
+
+
 def build_where(
     id: UUID,
     table_name: str,
     query: str | dict,
     attribute_mapping: dict,
     return_basic_filter: bool = True,
+    params: dict | None = None,
 ):
-    """Builds a PostgreSQL WHERE clause based on a CQL query and layer ID."""
+    """Builds a PostgreSQL WHERE clause based on a CQL query and layer ID. If a params dict is passed, the layer ID and the string literals of the query are added to it as bind parameters instead of being formatted into the clause."""
+
+    layer_filter = f"'{str(id)}'"
+    if params is not None:
+        params["layer_id"] = id
+        layer_filter = ":layer_id"
 
     if query is None:
         if return_basic_filter:
-            return f"{table_name}.layer_id = '{str(id)}'"
+            return f"{table_name}.layer_id = {layer_filter}"
         return None
     else:
         if isinstance(query, str):
@@ -470,10 +536,12 @@ def build_where(
         attribute_mapping["id"] = "id"
         attribute_mapping["geometry"] = "geom"
         attribute_mapping["geom"] = "geom"
-        where = f"{table_name}.layer_id = '{str(id)}' AND "
-        converted_cql = re.sub(
-            r'(?<=\(|\s|,)"', f'{table_name}."', to_sql_where(ast, attribute_mapping)
-        )
+        where = f"{table_name}.layer_id = {layer_filter} AND "
+        if params is not None:
+            sql_where = SQLBindEvaluator(attribute_mapping, params).evaluate(ast)
+        else:
+            sql_where = to_sql_where(ast, attribute_mapping)
+        converted_cql = re.sub(r'(?<=\(|\s|,)"', f'{table_name}."', sql_where)
         # Fixing issue with pygeofilter https://github.com/geopython/pygeofilter/pull/54
         converted_cql = converted_cql.replace(
             "ST_GeomFromWKB(x'", "ST_GeomFromWKB(E'\\\\x"
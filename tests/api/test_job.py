@@ -2,6 +2,8 @@ import pytest
 from httpx import AsyncClient
 
 from src.core.config import settings
+from src.crud.crud_job import job as crud_job
+from src.schemas.job import JobStatusType, JobType
 from tests.utils import get_with_wrong_id, upload_valid_files
 
 
@@ -36,6 +38,39 @@ async def test_mark_jobs_as_read(client: AsyncClient, fixture_create_feature_lay
     assert response.json()[0]["read"] is True
 
 
+@pytest.mark.asyncio
+async def test_update_status_of_killed_job(
+    client: AsyncClient, fixture_create_user, db_session
+):
+    job = await crud_job.check_and_create(
+        async_session=db_session,
+        user_id=fixture_create_user,
+        job_type=JobType.file_import,
+    )
+    job_id = str(job.id)
+
+    # Kill the job
+    response = await client.put(f"{settings.API_V2_STR}/job/kill/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status_simple"] == JobStatusType.killed.value
+
+    # A step finishing after the kill must not overwrite the killed status
+    job = await crud_job.update_status(
+        async_session=db_session,
+        job_id=job_id,
+        job_step_name="upload",
+        status=JobStatusType.running,
+    )
+    assert job.status_simple == JobStatusType.killed.value
+
+    response = await client.get(f"{settings.API_V2_STR}/job/{job_id}")
+    assert response.status_code == 200
+    job = response.json()
+    assert job["status_simple"] == JobStatusType.killed.value
+    assert job["status"]["upload"]["status"] == JobStatusType.killed.value
+    assert job["status"]["upload"]["timestamp_end"] is not None
+
+
 # @pytest.mark.asyncio
 # async def test_kill_job(client: AsyncClient, fixture_create_user):
 #     # # Create large geojson file out of valid.geojson by duplicating the features
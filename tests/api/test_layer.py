@@ -6,6 +6,7 @@ import pytest
 from httpx import AsyncClient
 
 from src.core.config import settings
+from src.crud.crud_layer import layer as crud_layer
 from src.db.models.layer import LayerType
 from src.schemas.layer import (
     AreaStatisticsOperation,
@@ -14,7 +15,7 @@ from src.schemas.layer import (
     TableLayerExportType,
 )
 from src.utils import delete_dir, delete_file
-from tests.utils import get_with_wrong_id
+from tests.utils import get_with_wrong_id, upload_invalid_file, upload_valid_file
 
 
 @pytest.mark.asyncio
@@ -30,6 +31,26 @@ async def test_files_upload_invalid(client: AsyncClient, fixture_upload_file_inv
     assert os.path.exists(f"{settings.DATA_DIR}/{job_id}") is False
 
 
+@pytest.mark.asyncio
+async def test_file_upload_csv_data_types(client: AsyncClient, fixture_create_user):
+    metadata = await upload_valid_file(client, "no_geometry")
+    data_types = metadata["data_types"]
+
+    # The data types of the CSV columns are detected
+    assert "id" in data_types["valid"]["integer"]
+    assert "katasterfläche_kfl" in data_types["valid"]["float"]
+    assert "geografischername_gen" in data_types["valid"]["text"]
+    assert data_types["unvalid"] == {}
+
+
+@pytest.mark.asyncio
+async def test_file_upload_xlsx_empty_header(client: AsyncClient, fixture_create_user):
+    response = await upload_invalid_file(client, "invalid_bad_formed.xlsx")
+    assert (
+        response["detail"] == "XLSX is not well-formed: Header contains empty values."
+    )
+
+
 @pytest.mark.asyncio
 async def test_create_layers(client: AsyncClient, fixture_create_layers):
     assert fixture_create_layers is not None
@@ -219,6 +240,54 @@ async def test_update_feature_layer(client: AsyncClient, fixture_create_feature_
     assert updated_layer["thumbnail_url"] == "https://updated-example.com"
 
 
+@pytest.mark.asyncio
+async def test_check_and_alter_layer_name(
+    client: AsyncClient,
+    fixture_create_feature_layer,
+    fixture_get_home_folder,
+    db_session,
+):
+    layer_id = fixture_create_feature_layer["id"]
+    folder_id = fixture_get_home_folder["id"]
+
+    async def rename_layer(name: str):
+        layer_dict = fixture_create_feature_layer
+        layer_dict["name"] = name
+        response = await client.put(
+            f"{settings.API_V2_STR}/layer/{layer_id}", json=layer_dict
+        )
+        assert response.status_code == 200
+
+    async def check_layer_name(name: str):
+        return await crud_layer.check_and_alter_layer_name(
+            async_session=db_session, folder_id=folder_id, layer_name=name
+        )
+
+    # The base name exists
+    await rename_layer("100% green_area")
+    assert await check_layer_name("100% green_area") == "100% green_area (1)"
+    # The LIKE wildcards in the layer name must not match other names
+    assert await check_layer_name("100% green area") == "100% green area"
+    assert await check_layer_name("100_ green_area") == "100_ green_area"
+    assert await check_layer_name("100") == "100"
+
+    # The highest number is increased
+    await rename_layer("100% green_area (9)")
+    assert await check_layer_name("100% green_area") == "100% green_area (10)"
+    assert await check_layer_name("100% green") == "100% green"
+
+    # Names that only look like a numbered name are ignored
+    await rename_layer("100% green_area (a)")
+    assert await check_layer_name("100% green_area") == "100% green_area"
+
+    # Numbers beyond the bigint range are counted up as well
+    await rename_layer("100% green_area (99999999999999999999)")
+    assert (
+        await check_layer_name("100% green_area")
+        == "100% green_area (100000000000000000000)"
+    )
+
+
 @pytest.mark.asyncio
 async def test_delete_layers(client: AsyncClient, fixture_delete_layers):
     return
@@ -479,20 +548,33 @@ async def test_get_layers(client: AsyncClient, fixture_create_multiple_layers):
     assert response.status_code == 200
     assert len(response.json()["items"]) == 4
 
-async def test_get_shared_team_layers(client: AsyncClient, fixture_create_shared_team_layers):
+
+async def test_get_shared_team_layers(
+    client: AsyncClient, fixture_create_shared_team_layers
+):
     team_id = fixture_create_shared_team_layers["teams"][0].id
     response = await client.post(f"{settings.API_V2_STR}/layer?team_id={team_id}")
     assert response.status_code == 200
     assert len(response.json()["items"]) == 5
 
-async def test_get_shared_organization_layers(client: AsyncClient, fixture_create_shared_organization_layers):
+
+async def test_get_shared_organization_layers(
+    client: AsyncClient, fixture_create_shared_organization_layers
+):
     organization_id = fixture_create_shared_organization_layers["organizations"][0].id
-    response = await client.post(f"{settings.API_V2_STR}/layer?organization_id={organization_id}")
+    response = await client.post(
+        f"{settings.API_V2_STR}/layer?organization_id={organization_id}"
+    )
     assert response.status_code == 200
     assert len(response.json()["items"]) == 5
 
+
 # Get metadata aggregate for layers based on different filters
-async def test_get_layers_with_shared(client: AsyncClient, fixture_create_shared_team_layers, fixture_create_shared_organization_layers):
+async def test_get_layers_with_shared(
+    client: AsyncClient,
+    fixture_create_shared_team_layers,
+    fixture_create_shared_organization_layers,
+):
     response = await client.post(f"{settings.API_V2_STR}/layer")
     assert response.status_code == 200
     assert len(response.json()["items"]) == 10
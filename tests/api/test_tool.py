@@ -5,7 +5,7 @@ from src.core.config import settings
 from src.db.models.layer import ToolType
 from src.schemas.job import JobStatusType
 from src.schemas.toolbox_base import ColumnStatisticsOperation
-from tests.utils import check_job_status, test_aggregate
+from tests.utils import check_chart_data, check_job_status, test_aggregate
 
 
 @pytest.mark.asyncio
@@ -126,6 +126,9 @@ async def test_aggregate_points_polygon(
         "points",
         "value",
     )
+    await check_chart_data(
+        client, fixture_add_aggregate_point_layers_to_project["project_id"]
+    )
 
 
 @pytest.mark.asyncio
@@ -140,6 +143,9 @@ async def test_aggregate_points_polygon_group_by(
         "value",
         ["category"],
     )
+    await check_chart_data(
+        client, fixture_add_aggregate_point_layers_to_project["project_id"]
+    )
 
 
 @pytest.mark.asyncio
@@ -408,6 +414,35 @@ async def test_reference_area(
     assert response.json()["type"] == "info"
 
 
+@pytest.mark.asyncio
+async def test_reference_area_with_filter(
+    client: AsyncClient, fixture_add_polygon_layer_to_project
+):
+    project_id = fixture_add_polygon_layer_to_project["project_id"]
+    layer_project_id = fixture_add_polygon_layer_to_project["layer_project_id"]
+
+    # The filter values are passed as bind parameters, including values with quotes
+    for plz in ["80333", "O'Brien"]:
+        response = await client.put(
+            f"{settings.API_V2_STR}/project/{project_id}/layer/{layer_project_id}",
+            json={
+                "query": {"cql": {"op": "=", "args": [{"property": "plz"}, plz]}},
+            },
+        )
+        assert response.status_code == 200
+
+        # Request reference area endpoint
+        response = await client.post(
+            f"{settings.API_V2_STR}/tool/check-reference-area?project_id={project_id}",
+            json={
+                "layer_project_id": layer_project_id,
+                "tool_type": ToolType.oev_gueteklasse.value,
+            },
+        )
+        assert response.status_code == 200
+        assert response.json()["type"] == "info"
+
+
 @pytest.mark.asyncio
 async def test_to_large_reference_area(
     client: AsyncClient, fixture_add_large_polygon_layer_to_project
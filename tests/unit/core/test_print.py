@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from src.core.print import PrintMap, basemaps
+
+point_source = {
+    "type": "geojson",
+    "data": {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [11.575, 48.137]},
+        "properties": {},
+    },
+}
+
+
+@pytest.mark.asyncio
+async def test_pooled_map_renders_thumbnails():
+    PrintMap._map_pool.clear()
+    print_map = PrintMap(async_session=None)
+
+    # Render two thumbnails with a layer each through the pool
+    maps = []
+    for _ in range(2):
+        async with print_map.pooled_map(basemaps["light"]) as map:
+            map.setSize(print_map.thumbnail_width, print_map.thumbnail_height)
+            map.addSource("thumbnail", json.dumps(point_source))
+            map.addLayer(
+                json.dumps({"id": "thumbnail", "type": "circle", "source": "thumbnail"})
+            )
+            image = map.renderPNG()
+            assert image.startswith(b"\x89PNG")
+        maps.append(map)
+
+    # The second thumbnail reused the map, which was reset to the bare style
+    assert maps[0] is maps[1]
+    assert len(PrintMap._map_pool[basemaps["light"]]) == 1
+    assert "thumbnail" not in maps[1].listLayers()
+    assert "thumbnail" not in maps[1].listSources()
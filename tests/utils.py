@@ -239,6 +239,43 @@ async def test_aggregate(
         assert job["status_simple"] == "finished"
 
 
+async def check_chart_data(client: AsyncClient, project_id: str):
+    """Check the chart data of all aggregation layers in a project."""
+
+    response = await client.get(f"{settings.API_V2_STR}/project/{project_id}/layer")
+    assert response.status_code == 200
+    layers_project = [
+        layer_project
+        for layer_project in response.json()
+        if layer_project.get("tool_type") in ("aggregate_point", "aggregate_polygon")
+    ]
+    assert len(layers_project) > 0
+
+    for layer_project in layers_project:
+        charts = layer_project["charts"]
+        chart_data = {}
+        for cumsum in (False, True):
+            response = await client.get(
+                f"{settings.API_V2_STR}/project/{project_id}/layer/{layer_project['id']}/chart-data?cumsum={str(cumsum).lower()}",
+            )
+            assert response.status_code == 200
+            data = response.json()
+            assert len(data["x"]) > 0
+            assert len(data["x"]) == len(data["y"])
+            if charts.get("group_by"):
+                assert len(data["group"]) == len(data["x"])
+            else:
+                assert data.get("group") is None
+            chart_data[cumsum] = data
+
+        # The last cumulated count is the total count
+        if (
+            not charts.get("group_by")
+            and charts["operation"] == ColumnStatisticsOperation.count.value
+        ):
+            assert chart_data[True]["y"][-1] == sum(chart_data[False]["y"])
+
+
 async def check_user_data_deleted(
     layer: dict,
 ):